@@ -6,20 +6,44 @@ Automatically organizes course materials following the naming conventions.
 
 Usage:
     python organize_materials.py <folder_path>
+    python organize_materials.py --batch [--apply] [--decisions FILE] [root]
+    python organize_materials.py --benchmark <file_count>
+    python organize_materials.py --dedupe [--write] [root]
 
 The script will:
 1. Analyze the folder structure
 2. Detect content type
 3. Apply naming conventions
 4. Ask for guidance when uncertain
+
+With --batch it never prompts: questions are answered from
+organize-decisions.json (glob "rules" plus per-file entries), files it
+cannot settle are written there as empty placeholders for the next run,
+and renames are only applied with --apply.
+
+With --dedupe it instead reports files whose contents are identical, and
+with --write records them in duplicates.json so the chapter pipeline OCRs
+only one canonical copy of each.
 """
 
 import os
 import sys
+import argparse
 import re
+import json
+import time
+import random
 import shutil
+import fnmatch
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Shares the pipeline's cached (size, mtime) -> sha256 index of input-materials
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scripts"))
+from materials_index import file_sha256
 
 # Course codes
 COURSE_CODES = {
@@ -38,20 +62,98 @@ CONTENT_PATTERNS = {
     "other": [],
 }
 
+CONTENT_TYPES = list(CONTENT_PATTERNS)
+# (keyword, type) in priority order, flattened once instead of per call
+CONTENT_KEYWORDS = tuple(
+    (keyword, content_type)
+    for content_type, keywords in CONTENT_PATTERNS.items()
+    for keyword in keywords
+)
+EXAM_HINT_RE = re.compile(r"(20\d{2}|exam|בחינה)")
+
+# Number patterns in priority order
+NUMBER_RES = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        r"תרגיל\s*(\d+)",
+        r"קובץ\s*(\d+)",
+        r"פרק\s*(\d+)",
+        r"ch?apter[_-]?(\d+)",
+        r"(\d+)[_-]",
+        r"^(\d+)",
+    ]
+]
+
+HEBREW_TO_ENGLISH = {
+    "תרגיל": "exercise",
+    "קובץ": "file",
+    "פרק": "chapter",
+    "מאזן": "balance",
+    "רווח": "profit",
+    "הפסד": "loss",
+    "מלאי": "inventory",
+    "רכוש": "assets",
+    "קבוע": "fixed",
+    "חשבונות": "accounts",
+    "חתך": "cut",
+    "פקודות": "entries",
+    "יומן": "journal",
+    "גבולות": "limits",
+    "נגזרות": "derivatives",
+    "רציפות": "continuity",
+    "פונקציה": "function",
+    "שחזור": "reconstruction",
+}
+HEBREW_RE = re.compile(r"[\u0590-\u05ff]")
+# Longest word first, so one pass replaces every word
+TRANSLITERATION_RE = re.compile(
+    "|".join(
+        re.escape(word) for word in sorted(HEBREW_TO_ENGLISH, key=len, reverse=True)
+    )
+)
+SPECIAL_CHARS_RE = re.compile(r"[^\w\s-]")
+SEPARATORS_RE = re.compile(r"[\s_]+")
+HYPHENS_RE = re.compile(r"-+")
+
+# Dedupe: bytes read from each end of a file for the cheap prefilter hash
+PARTIAL_HASH_BYTES = 64 * 1024
+HASH_WORKERS = 8
+# chapter_pipeline.py resolves the recorded paths against this folder, whatever root was scanned
+MATERIALS_ROOT = Path(__file__).resolve().parent
+DUPLICATES_FILE = MATERIALS_ROOT / "duplicates.json"
+
+# Batch mode answers the interactive questions from this file (in the organized root)
+DECISIONS_NAME = "organize-decisions.json"
+YEAR_CHOICES = ["2015", "2018", "2019", "2020", "2021", "2022", "2023", "2024", "2025"]
+SKIP_DIRS = {"extracted"}
+# Names that already follow the conventions in README.md; batch runs leave them alone
+ORGANIZED_RE = re.compile(
+    r"^(?:(?:lecture-\d{2}|exercise-\d{2}[abc]?|exam-\d{4}-(?:[ab]|american))[-.]"
+    # ai-slides: NN-topic[-detail]
+    r"|\d{2}(?:-[a-z0-9]+)+\.\w+$)",
+    re.IGNORECASE,
+)
+# Canonical copies are taken from the folders the pipeline reads first
+CANONICAL_FOLDER_ORDER = [
+    "lecture-slides",
+    "ai-slides",
+    "exercises",
+    "exams",
+    "drills",
+    "other",
+]
+
 
 def detect_content_type(filename: str, folder_name: str = "") -> str:
     """Detect content type based on filename and folder name."""
     combined = f"{folder_name} {filename}".lower()
 
-    for content_type, keywords in CONTENT_PATTERNS.items():
-        if not keywords:
-            continue
-        for keyword in keywords:
-            if keyword in combined:
-                return content_type
+    for keyword, content_type in CONTENT_KEYWORDS:
+        if keyword in combined:
+            return content_type
 
     # Check for year patterns (exams)
-    if re.search(r"(20\d{2}|exam|בחינה)", combined):
+    if EXAM_HINT_RE.search(combined):
         return "exams"
 
     return "other"
@@ -59,21 +161,10 @@ def detect_content_type(filename: str, folder_name: str = "") -> str:
 
 def extract_number_from_hebrew(filename: str) -> Optional[str]:
     """Extract number from Hebrew file (e.g., 'תרגיל 1', 'קובץ 2')."""
-    # Pattern for Hebrew numbers after words like תרגיל, קובץ, פרק
-    patterns = [
-        r"תרגיל\s*(\d+)",
-        r"קובץ\s*(\d+)",
-        r"פרק\s*(\d+)",
-        r"ch?apter[_-]?(\d+)",
-        r"(\d+)[_-]",
-        r"^(\d+)",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, filename, re.IGNORECASE)
+    for pattern in NUMBER_RES:
+        match = pattern.search(filename)
         if match:
-            num = match.group(1)
-            return f"{int(num):02d}"
+            return f"{int(match.group(1)):02d}"
 
     return None
 
@@ -105,36 +196,17 @@ def sanitize_filename(filename: str) -> str:
     # Remove extension
     name, ext = os.path.splitext(filename)
 
-    # Replace Hebrew characters with English equivalents (basic)
-    hebrew_to_english = {
-        "תרגיל": "exercise",
-        "קובץ": "file",
-        "פרק": "chapter",
-        "מאזן": "balance",
-        "רווח": "profit",
-        "הפסד": "loss",
-        "מלאי": "inventory",
-        "רכוש": "assets",
-        "קבוע": "fixed",
-        "חשבונות": "accounts",
-        "חתך": "cut",
-        "פקודות": "entries",
-        "יומן": "journal",
-        "גבולות": "limits",
-        "נגזרות": "derivatives",
-        "רציפות": "continuity",
-        "פונקציה": "function",
-        "שחזור": "reconstruction",
-    }
-
+    # Replace Hebrew words with English equivalents (basic), in one pass
     name_lower = name.lower()
-    for heb, eng in hebrew_to_english.items():
-        name_lower = name_lower.replace(heb, eng)
+    if HEBREW_RE.search(name_lower):
+        name_lower = TRANSLITERATION_RE.sub(
+            lambda m: HEBREW_TO_ENGLISH[m.group(0)], name_lower
+        )
 
-    # Replace spaces and special chars with hyphens
-    name_lower = re.sub(r"[^\w\s-]", "", name_lower)
-    name_lower = re.sub(r"[\s_]+", "-", name_lower)
-    name_lower = re.sub(r"-+", "-", name_lower)
+    # Remove special chars, replace spaces with hyphens
+    name_lower = SPECIAL_CHARS_RE.sub("", name_lower)
+    name_lower = SEPARATORS_RE.sub("-", name_lower)
+    name_lower = HYPHENS_RE.sub("-", name_lower)
     name_lower = name_lower.strip("-")
 
     return f"{name_lower}{ext}"
@@ -190,7 +262,7 @@ def suggest_filename(
 
         # Check for letter suffix (a, b, c)
         letter = ""
-        match = re.search(r"[abc]$", base, re.IGNORECASE)
+        match = re.search(r"([abc])$", base, re.IGNORECASE)
         if match:
             letter = match.group(1).lower()
 
@@ -223,6 +295,56 @@ def ask_user(prompt: str, options: Optional[list] = None) -> str:
         return input(f"\n{prompt}: ").strip()
 
 
+def classify_file(
+    filename: str, folder_name: str, answer
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Classify one file and build its new name.
+
+    answer(field, prompt, options) resolves what the name alone cannot
+    ("type", "year", "session"). Returns (content_type, new_name); new_name
+    is None when a question went unanswered.
+    """
+    # A file already filed under a type folder is that type ("slides" would make ai-slides lectures)
+    if folder_name in CONTENT_TYPES and folder_name != "other":
+        content_type = folder_name
+    else:
+        content_type = detect_content_type(filename, folder_name)
+
+    # Extract number if present
+    number = extract_number_from_hebrew(filename)
+
+    # Ask for confirmation if uncertain
+    if content_type == "other" or not number:
+        content_type = answer("type", f"What type is '{filename}'?", CONTENT_TYPES)
+        if not content_type:
+            return None, None
+
+    if content_type != "exams":
+        return content_type, suggest_filename(filename, content_type, number or "01")
+
+    # Check if year and session can be extracted
+    year = extract_year_from_filename(filename) or answer(
+        "year", f"What year is '{filename}'?", YEAR_CHOICES
+    )
+    session = extract_session_from_filename(filename) or answer(
+        "session", f"What session (a/b) is '{filename}'?", ["a", "b"]
+    )
+    if not (year and session):
+        return content_type, None
+
+    # Build exam filename, keeping the same details as suggest_filename
+    detail = ""
+    if "solution" in filename.lower() or "פתרון" in filename:
+        detail = "-solution"
+    elif "questions" in filename.lower() or "שאלות" in filename:
+        detail = "-questions"
+    elif "american" in filename.lower():
+        detail = "-american"
+
+    return content_type, f"exam-{year}-{session}{detail}{Path(filename).suffix}"
+
+
 def analyze_and_organize(folder_path: str, dry_run: bool = True):
     """Main function to analyze and organize materials."""
     path = Path(folder_path)
@@ -253,58 +375,11 @@ def analyze_and_organize(folder_path: str, dry_run: bool = True):
         if file_path.parent == path:
             continue
 
-        filename = file_path.name
-        folder_name = file_path.parent.name
-
-        # Detect content type
-        content_type = detect_content_type(filename, folder_name)
-
-        # Extract number if present
-        number = extract_number_from_hebrew(filename)
-
-        # Ask for confirmation if uncertain
-        if content_type == "other" or not number:
-            content_type = ask_user(
-                f"What type is '{filename}'?", list(CONTENT_PATTERNS.keys())
-            )
-
-        if content_type == "exams":
-            # Check if year can be extracted
-            year = extract_year_from_filename(filename)
-            if not year:
-                year = ask_user(
-                    f"What year is '{filename}'?",
-                    [
-                        "2015",
-                        "2018",
-                        "2019",
-                        "2020",
-                        "2021",
-                        "2022",
-                        "2023",
-                        "2024",
-                        "2025",
-                    ],
-                )
-
-            session = extract_session_from_filename(filename)
-            if not session:
-                session = ask_user(f"What session (a/b) is '{filename}'?", ["a", "b"])
-
-            # Build exam filename
-            detail = ""
-            if "solution" in filename.lower() or "פתרון" in filename:
-                detail = "-solution"
-            elif "questions" in filename.lower():
-                detail = "-questions"
-
-            new_name = f"exam-{year}-{session}{detail}{file_path.suffix}"
-
-        else:
-            # Suggest filename
-            new_name = suggest_filename(
-                filename, content_type, number if number else "01"
-            )
+        content_type, new_name = classify_file(
+            file_path.name,
+            file_path.parent.name,
+            lambda field, prompt, options: ask_user(prompt, options),
+        )
 
         # Determine target folder
         target_folder = file_path.parent
@@ -355,6 +430,367 @@ def analyze_and_organize(folder_path: str, dry_run: bool = True):
         print("No changes needed.")
 
 
+def walk_files(root: Path) -> Iterator[Path]:
+    """Stream every file below root's subfolders with one os.scandir pass."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(Path(entry.path))
+                # Files directly in root are left alone, as in interactive mode
+                elif directory != root and entry.is_file():
+                    yield Path(entry.path)
+
+
+def load_decisions(path: Path) -> dict:
+    """Load the decisions file: {"rules": [{"match": glob, ...}], "files": {path: {...}}}."""
+    if not path.exists():
+        return {"rules": [], "files": {}}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data.setdefault("rules", [])
+    data.setdefault("files", {})
+    return data
+
+
+def compile_rules(rules: List[dict]):
+    """Combine every rule glob into one regex; the first matching rule wins."""
+    if not rules:
+        return None
+    return re.compile(
+        "|".join(
+            f"(?P<r{i}>{fnmatch.translate(rule['match'])})"
+            for i, rule in enumerate(rules)
+        )
+    )
+
+
+def plan_batch(root: Path, decisions: dict) -> dict:
+    """Classify every file under root without prompting."""
+    rules = decisions["rules"]
+    files = decisions["files"]
+    matcher = compile_rules(rules)
+    changes, pending, collisions, targets = [], {}, [], set()
+    scanned = 0
+
+    for file_path in walk_files(root):
+        scanned += 1
+        if ORGANIZED_RE.match(file_path.name):
+            continue
+        relative = file_path.relative_to(root).as_posix()
+        decision = {}
+        match = matcher.fullmatch(relative) if matcher else None
+        if match:
+            decision.update(rules[int(match.lastgroup[1:])])
+        # Per-file entries override the rules; a relative path beats a bare filename
+        for key in (file_path.name, relative):
+            decision.update({k: v for k, v in files.get(key, {}).items() if v})
+
+        def answer(field, prompt, options):
+            value = decision.get(field)
+            return value if value and (field == "year" or value in options) else None
+
+        if decision.get("name"):
+            content_type, new_name = decision.get("type", "other"), decision["name"]
+        else:
+            content_type, new_name = classify_file(
+                file_path.name, file_path.parent.name, answer
+            )
+        if new_name is None:
+            pending[relative] = {
+                "type": content_type,
+                "year": None,
+                "session": None,
+                "guess": detect_content_type(file_path.name, file_path.parent.name),
+            }
+            continue
+        if new_name == file_path.name:
+            continue
+
+        target = file_path.with_name(new_name)
+        if target in targets or target.exists():
+            collisions.append(relative)
+            continue
+        targets.add(target)
+        changes.append(
+            {
+                "from": relative,
+                "to": target.relative_to(root).as_posix(),
+                "type": content_type,
+            }
+        )
+
+    return {
+        "changes": changes,
+        "pending": pending,
+        "collisions": collisions,
+        "scanned": scanned,
+    }
+
+
+def organize_batch(root: Path, decisions_path: Path, apply: bool = False):
+    """Non-interactive run: rename everything the name or the decisions file settles."""
+    decisions = load_decisions(decisions_path)
+    started = time.perf_counter()
+    plan = plan_batch(root, decisions)
+    elapsed = time.perf_counter() - started
+    changes, pending = plan["changes"], plan["pending"]
+
+    for change in changes:
+        print(f"  {change['type']:14} | {change['from']} -> {Path(change['to']).name}")
+    for relative in plan["collisions"]:
+        print(f"⚠️ Skipping {relative}: its new name is already taken")
+    print(
+        f"\n🔎 {plan['scanned']} files classified in {elapsed:.2f}s: "
+        f"{len(changes)} to rename, {len(pending)} need a decision"
+    )
+
+    if apply:
+        for change in changes:
+            os.rename(root / change["from"], root / change["to"])
+        print(f"✓ Applied {len(changes)} changes.")
+    elif changes:
+        print("Dry run - pass --apply to rename.")
+
+    if pending and not apply:
+        print(f"📝 Rerun with --apply to add placeholders for them to {decisions_path}")
+    elif pending:
+        # Leave empty placeholders for the undecided files, so the next run can settle them
+        for relative, placeholder in pending.items():
+            decisions["files"].setdefault(relative, placeholder)
+        decisions_path.write_text(
+            json.dumps(decisions, ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"📝 Fill in type/year/session for them in {decisions_path}")
+
+
+def make_synthetic_tree(root: Path, count: int, seed: int = 0):
+    """Create count empty files with realistic Hebrew/English names under root."""
+    rng = random.Random(seed)
+    words = [
+        "מאזן",
+        "רווח והפסד",
+        "מלאי",
+        "גבולות",
+        "נגזרות",
+        "פונקציה",
+        "demand",
+        "supply",
+        "cost",
+    ]
+    patterns = [
+        "lecture {n} {w}.pdf",
+        "תרגיל {n} - {w}.pdf",
+        "קובץ {n} {w}b.docx",
+        "בחינה {y} מועד {s} פתרון.pdf",
+        "exam_{y}_{s}_questions.pdf",
+        "NotebookLM {w} {n}.pdf",
+        "פרק {n} {w} (1).pdf",
+        "{w} summary.pdf",
+    ]
+    folders = ["lecture-slides", "exercises", "exams", "ai-slides", "misc"]
+    for course in COURSE_CODES:
+        for folder in folders:
+            (root / course / folder).mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        name = rng.choice(patterns).format(
+            n=rng.randint(1, 14),
+            w=rng.choice(words),
+            y=rng.randint(2015, 2025),
+            s=rng.choice("אב"),
+        )
+        folder = root / rng.choice(list(COURSE_CODES)) / rng.choice(folders)
+        # A unique prefix keeps names from colliding
+        (folder / f"{i:06d}_{name}").touch()
+
+
+def benchmark_batch(count: int):
+    """Time a full batch classify + rename over a synthetic tree of count files."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_synthetic_tree(root, count)
+        decisions = {"rules": [{"match": "*/misc/*", "type": "other"}], "files": {}}
+
+        started = time.perf_counter()
+        plan = plan_batch(root, decisions)
+        planned = time.perf_counter()
+        for change in plan["changes"]:
+            os.rename(root / change["from"], root / change["to"])
+        finished = time.perf_counter()
+
+    scanned = plan["scanned"]
+    print(
+        f"🏁 {scanned} files classified in {planned - started:.2f}s "
+        f"({scanned / (planned - started):,.0f} files/s)"
+    )
+    print(
+        f"   {len(plan['changes'])} renamed in {finished - planned:.2f}s, "
+        f"{len(plan['collisions'])} name collisions, "
+        f"{len(plan['pending'])} left for the decisions file"
+    )
+
+
+def partial_hash(file_path: Path) -> str:
+    """Hash the first and last PARTIAL_HASH_BYTES of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        f.seek(max(0, file_path.stat().st_size - PARTIAL_HASH_BYTES))
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+def _refine(groups: List[List[Path]], hash_fn, workers: int) -> Dict[Tuple, List[Path]]:
+    """Split candidate groups by hash_fn (run in parallel), keeping groups of 2+."""
+    files = [f for group in groups for f in group]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = dict(zip(files, executor.map(hash_fn, files)))
+    refined: Dict[Tuple, List[Path]] = {}
+    for group_id, group in enumerate(groups):
+        for f in group:
+            refined.setdefault((group_id, hashes[f]), []).append(f)
+    return {key: group for key, group in refined.items() if len(group) > 1}
+
+
+def materials_path(file_path: Path, root: Path) -> Path:
+    """file_path relative to input-materials, or to root for a tree outside it."""
+    if file_path.is_relative_to(MATERIALS_ROOT):
+        return file_path.relative_to(MATERIALS_ROOT)
+    return file_path.relative_to(root)
+
+
+def canonical_sort_key(file_path: Path, root: Path):
+    """Prefer files in the pipeline's source folders, then shorter and earlier paths."""
+    # <course>/<folder>/..., also when only one course or folder was scanned
+    parts = materials_path(file_path, root).parts
+    folder = parts[1] if len(parts) > 2 else ""
+    rank = (
+        CANONICAL_FOLDER_ORDER.index(folder)
+        if folder in CANONICAL_FOLDER_ORDER
+        else len(CANONICAL_FOLDER_ORDER)
+    )
+    return (rank, len(parts), str(file_path))
+
+
+def find_duplicates(root: Path, workers: int = HASH_WORKERS) -> List[dict]:
+    """
+    Find groups of byte-identical files under root.
+
+    Files are grouped by size first, then by a hash of their first and last
+    64 KB, and only files still sharing a group get a full SHA-256. Both
+    hashing rounds run on a thread pool. Each group lists its canonical copy
+    first.
+    """
+    by_size: Dict[int, List[Path]] = {}
+    for file_path in root.rglob("*"):
+        if (
+            file_path.is_file()
+            and "extracted" not in file_path.parts
+            and file_path != DUPLICATES_FILE
+        ):
+            by_size.setdefault(file_path.stat().st_size, []).append(file_path)
+    candidates = [
+        group for size, group in by_size.items() if len(group) > 1 and size > 0
+    ]
+
+    # Small files are fully covered by the partial hash, so one round is enough for them
+    partial = _refine(candidates, partial_hash, workers)
+    needs_full = [
+        group
+        for group in partial.values()
+        if group[0].stat().st_size > 2 * PARTIAL_HASH_BYTES
+    ]
+    confirmed = [
+        group
+        for group in partial.values()
+        if group[0].stat().st_size <= 2 * PARTIAL_HASH_BYTES
+    ]
+    confirmed += list(_refine(needs_full, file_sha256, workers).values())
+
+    duplicates = []
+    for group in confirmed:
+        group = sorted(group, key=lambda f: canonical_sort_key(f, root))
+        duplicates.append(
+            {
+                "sha256": file_sha256(group[0]),
+                "size": group[0].stat().st_size,
+                "canonical": materials_path(group[0], root).as_posix(),
+                "duplicates": [materials_path(f, root).as_posix() for f in group[1:]],
+            }
+        )
+    return sorted(duplicates, key=lambda d: d["canonical"])
+
+
+def report_duplicates(root: Path, write: bool = False):
+    """Print duplicate groups under root and optionally save them to duplicates.json."""
+    duplicates = find_duplicates(root)
+    if not duplicates:
+        print("No duplicate files found.")
+    wasted = 0
+    for group in duplicates:
+        wasted += group["size"] * len(group["duplicates"])
+        print(f"\n  {group['size'] / 1024:.0f} KB  {group['canonical']}  (canonical)")
+        for duplicate in group["duplicates"]:
+            print(f"             {duplicate}")
+    if duplicates:
+        copies = sum(len(group["duplicates"]) for group in duplicates)
+        print(
+            f"\n{len(duplicates)} duplicate group(s), {copies} redundant copies, {wasted / 1024 / 1024:.1f} MB"
+        )
+
+    if write and not root.is_relative_to(MATERIALS_ROOT):
+        print(f"❌ {DUPLICATES_FILE.name} only records files under {MATERIALS_ROOT}")
+    elif write:
+        # Groups found under other courses or folders in earlier runs stay recorded
+        scanned = root.relative_to(MATERIALS_ROOT)
+        kept = []
+        if DUPLICATES_FILE.exists():
+            previous = json.loads(DUPLICATES_FILE.read_text(encoding="utf-8"))
+            kept = [
+                group
+                for group in previous["groups"]
+                if not Path(group["canonical"]).is_relative_to(scanned)
+            ]
+        groups = sorted(kept + duplicates, key=lambda d: d["canonical"])
+        DUPLICATES_FILE.write_text(
+            json.dumps({"groups": groups}, ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"✓ Wrote {DUPLICATES_FILE.name}")
+
+
+def parse_batch_args(argv: list) -> argparse.Namespace:
+    """Parse the --batch command line: [--apply] [--decisions FILE] [root]."""
+    parser = argparse.ArgumentParser(
+        prog="organize_materials.py --batch",
+        description="Rename files without prompting, answering from a decisions file",
+    )
+    parser.add_argument("--batch", action="store_true")
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Rename files (default: only print the plan)",
+    )
+    parser.add_argument(
+        "--decisions",
+        type=Path,
+        help=f"Decisions file (default: <root>/{DECISIONS_NAME})",
+    )
+    parser.add_argument(
+        "root",
+        nargs="?",
+        type=Path,
+        default=Path(__file__).parent,
+        help="Folder to organize",
+    )
+    return parser.parse_args(argv)
+
+
 def main():
     """Main entry point."""
     if len(sys.argv) < 2:
@@ -363,6 +799,22 @@ def main():
         print("  python organize_materials.py ./math/lecture-slides")
         sys.exit(1)
 
+    if "--benchmark" in sys.argv:
+        benchmark_batch(int(sys.argv[sys.argv.index("--benchmark") + 1]))
+        return
+
+    if "--batch" in sys.argv:
+        args = parse_batch_args(sys.argv[1:])
+        root = args.root.resolve()
+        organize_batch(root, args.decisions or root / DECISIONS_NAME, apply=args.apply)
+        return
+
+    if "--dedupe" in sys.argv:
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+        root = Path(args[0]) if args else Path(__file__).parent
+        report_duplicates(root.resolve(), write="--write" in sys.argv)
+        return
+
     folder_path = sys.argv[1]
 
     # Check for dry-run flag
@@ -0,0 +1,212 @@
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+
+def heavy_resources(writer):
+    """
+    Deck-wide resources like a real export's: a 300 DPI full-page photo and an
+    embedded font no page uses, both referenced from every page.
+    """
+    from pypdf.generic import DictionaryObject, NameObject, NumberObject, StreamObject
+    rng = random.Random(0)
+    width, height = 2480, 3508
+    # Low-amplitude noise over a vertical gradient compresses about as badly as a photo
+    noise_rows = [bytes(b & 15 for b in rng.randbytes(width * 3)) for _ in range(8)]
+    rows = [noise_rows[y % 8].translate(bytes(min(255, v + y * 200 // height) for v in range(256))) for y in range(height)]
+    photo = StreamObject()
+    photo.set_data(zlib.compress(b"".join(rows), 6))
+    photo.update({
+        NameObject("/Type"): NameObject("/XObject"), NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(width), NameObject("/Height"): NumberObject(height),
+        NameObject("/ColorSpace"): NameObject("/DeviceRGB"), NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/FlateDecode"),
+    })
+    font_file = StreamObject()
+    font_file.set_data(rng.randbytes(300 * 1024))
+    unused_font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/TrueType"),
+        NameObject("/BaseFont"): NameObject("/DeckFont"),
+        NameObject("/FontDescriptor"): writer._add_object(DictionaryObject({
+            NameObject("/Type"): NameObject("/FontDescriptor"), NameObject("/FontName"): NameObject("/DeckFont"),
+            NameObject("/FontFile2"): writer._add_object(font_file),
+        })),
+    })
+    used_font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    return DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im1"): writer._add_object(photo)}),
+        NameObject("/Font"): DictionaryObject({
+            NameObject("/F1"): writer._add_object(used_font), NameObject("/F2"): writer._add_object(unused_font),
+        }),
+    })
+
+def make_pdf(path: Path, pages: int, heavy: bool = False):
+    from pypdf import PdfWriter
+    from pypdf.generic import ContentStream, NameObject
+    writer = PdfWriter()
+    resources = heavy_resources(writer) if heavy else None
+    for i in range(pages):
+        page = writer.add_blank_page(width=595, height=842)
+        if heavy:
+            page[NameObject("/Resources")] = resources
+            content = ContentStream(None, None)
+            content.set_data(f"q 595 0 0 842 0 0 cm /Im1 Do Q BT /F1 24 Tf 72 760 Td (Slide {i + 1}) Tj ET".encode("ascii"))
+            page.replace_contents(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+def make_extracted_markdown(path: Path, pages: int):
+    from fake_gemini import synthetic_page_text
+    parts = [f"# Extracted Content: bench Topic 01\n\n"]
+    parts += [f"--- PAGE {i} ---\n{synthetic_page_text(i)}\n" for i in range(1, pages + 1)]
+    path.write_text("".join(parts), encoding="utf-8")
+
+def run_scenario(scenario):
+    """Run one scenario end to end in this (fresh) process and return its measurements."""
+    os.environ["SIKUMNIK_METRICS"] = "0"
+    import gemini_precision_ocr
+    import generate_lesson
+    from fake_gemini import FakeGemini
+    from key_pool import KeyPool
+
+    fake = FakeGemini(**scenario["fake"])
+    keys = [f"fake-key-{i + 1}" for i in range(scenario["keys"])]
+    pool = KeyPool.from_keys(*keys, rpm=10 ** 6, tpm=10 ** 9, max_concurrency=scenario["workers"], client_factory=fake.client)
+    error = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Outputs land in the temp tree, never in input-materials/ or web/
+        gemini_precision_ocr.PROJECT_ROOT = tmp
+        generate_lesson.PROJECT_ROOT = tmp
+        started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if scenario["stage"] == "ocr":
+                    pdf_path = tmp / "bench.pdf"
+                    make_pdf(pdf_path, scenario["pages"], heavy=scenario["heavy"])
+                    started = time.perf_counter()
+                    summaries = gemini_precision_ocr.extract_pdfs([pdf_path], "bench", "01", pool, workers=scenario["workers"],
+                                                                  slim=scenario["slim"])
+                    failed = sum(len(summary["failed_pages"]) for summary in summaries)
+                    if failed:
+                        error = f"{failed} page(s) failed"
+                else:
+                    md_path = tmp / "topic-01-extracted.md"
+                    make_extracted_markdown(md_path, scenario["pages"])
+                    started = time.perf_counter()
+                    generate_lesson.generate_lesson(
+                        "bench", "01", md_path, pool=pool, stream=scenario["stream"],
+                        chunk_tokens=scenario["chunk_tokens"], repair=scenario["repair"]
+                    )
+        except (Exception, SystemExit) as e:
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        wall = time.perf_counter() - started
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+    return {**scenario, "wall_s": wall, "pages_per_s": scenario["pages"] / wall if wall else 0.0,
+            "peak_rss_mb": rss_mb, "stats": fake.stats, "error": error}
+
+def scenario_name(scenario):
+    return f"{scenario['stage']}/{scenario['pages']}p/{scenario['workers']}w{'/slim' if scenario['slim'] else ''}"
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark against a fake Gemini client")
+    parser.add_argument("--stages", default="ocr,lesson", help="Comma-separated stages to run (default: ocr,lesson)")
+    parser.add_argument("--pages", default="10,100,500", help="Synthetic document sizes in pages (default: 10,100,500)")
+    parser.add_argument("--workers", default="1,4,8", help="OCR concurrency settings to compare (default: 1,4,8)")
+    parser.add_argument("--keys", type=int, default=2, help="Fake API keys in the pool (default: 2)")
+    parser.add_argument("--latency", default="lognormal:0.05,0.5", help="fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Share of lesson responses cut short")
+    parser.add_argument("--malformed", type=float, default=0.0, help="Share of lesson responses with broken JSON syntax")
+    parser.add_argument("--offschema", type=float, default=0.0, help="Share of lesson responses missing a required field")
+    parser.add_argument("--replay", help="Directory of recorded responses (*.md for OCR, *.json or lesson cache entries)")
+    parser.add_argument("--stream", action="store_true", help="Benchmark streamed lesson generation")
+    parser.add_argument("--chunk-tokens", type=int, help="Chunk budget for lesson generation")
+    parser.add_argument("--repair", action="store_true", help="Repair off-schema lesson blocks")
+    parser.add_argument("--upload-mbps", type=float, help="Add upload time for every request's payload at this bandwidth")
+    parser.add_argument("--heavy", action="store_true", help="OCR pages carrying a 300 DPI photo and an unused embedded font")
+    parser.add_argument("--slim", default="off", help="Slim OCR pages before upload: off, on or off,on to compare (default: off)")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for latency and fault sampling")
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Fail if pages/s dropped against this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed pages/s drop against the baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    fake = {
+        "latency": args.latency, "rate_429": args.rate_429, "truncate": args.truncate, "malformed": args.malformed,
+        "offschema": args.offschema, "replay_dir": args.replay, "seed": args.seed, "upload_mbps": args.upload_mbps,
+    }
+    scenarios = []
+    for stage in args.stages.split(","):
+        for pages in parse_ints(args.pages):
+            # Lesson concurrency comes from chunking, not --workers
+            for workers in parse_ints(args.workers) if stage == "ocr" else [max(parse_ints(args.workers))]:
+                for slim in args.slim.split(",") if stage == "ocr" else ["off"]:
+                    scenarios.append({"stage": stage, "pages": pages, "workers": workers, "keys": args.keys, "fake": fake,
+                                      "stream": args.stream, "chunk_tokens": args.chunk_tokens, "repair": args.repair,
+                                      "heavy": args.heavy, "slim": slim == "on"})
+
+    # One fresh process per scenario, so peak RSS belongs to that scenario alone
+    context = multiprocessing.get_context("spawn")
+    results = []
+    print(f"🏁 Running {len(scenarios)} scenario(s) against the fake client ({args.latency}, {args.keys} key(s))")
+    for scenario in scenarios:
+        with context.Pool(1) as process:
+            result = process.apply(run_scenario, (scenario,))
+        results.append(result)
+        status = f"❌ {result['error']}" if result["error"] else "✅"
+        kb_per_call = result["stats"]["upload_bytes"] / max(1, result["stats"]["calls"]) / 1024
+        print(f"   {scenario_name(result):<23} {result['wall_s']:>8.2f}s {result['pages_per_s']:>9.1f} pages/s "
+              f"{result['peak_rss_mb']:>7.0f} MB {kb_per_call:>8.0f} KB/call  calls={result['stats']['calls']} "
+              f"429s={result['stats']['429']}  {status}")
+
+    current = {scenario_name(r): {"pages_per_s": r["pages_per_s"], "wall_s": r["wall_s"], "peak_rss_mb": r["peak_rss_mb"]}
+               for r in results if not r["error"]}
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+        print(f"💾 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = []
+        for name, previous in baseline.items():
+            if name not in current:
+                continue
+            change = current[name]["pages_per_s"] / previous["pages_per_s"] - 1
+            if change < -args.tolerance:
+                regressions.append(f"{name}: {previous['pages_per_s']:.1f} → {current[name]['pages_per_s']:.1f} pages/s ({change:+.0%})")
+        if regressions:
+            print(f"❌ Throughput regressed more than {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"🎉 No throughput regression beyond {args.tolerance:.0%}")
+
+    if any(r["error"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import re
+import math
+from collections import Counter
+from lesson_chunks import PAGE_MARKER_RE, split_units
+
+# A line on at least this share of a source's pages is slide template, not content
+MIN_PAGE_SHARE = 0.5
+# Below this many pages a repeated line is as likely a recurring point as a footer
+MIN_SOURCE_PAGES = 4
+# Only short lines (headers, footers, course titles) can be slide template; a longer repeated line is content
+MAX_FOOTER_CHARS = 80
+
+SPACE_RE = re.compile(r"\s+")
+DIGITS_RE = re.compile(r"\d+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+def normalize_line(line):
+    return SPACE_RE.sub(" ", line).strip()
+
+def template_keys(line, page_num):
+    """Keys under which a line is counted across pages; empty for lines that are never boilerplate."""
+    line = normalize_line(line)
+    # Formulas, table rows, headings and failed-page notes are content even when they repeat;
+    # chunking also relies on the headings
+    if not line or len(line) > MAX_FOOTER_CHARS or "$" in line or line.startswith(("|", "#", ">[PAGE")):
+        return ()
+    number = DIGITS_RE.search(line)
+    if number:
+        # The literal line catches fixed numbers ("מבוא למיקרו כלכלה 10131"); the page-relative key
+        # makes "עמוד 3 מתוך 40" on page 3 and "עמוד 4 מתוך 40" on page 4 one footer, but not "דוגמה 2" on page 7
+        return line, (DIGITS_RE.sub("#", line), int(number.group()) - page_num)
+    return (line,)
+
+def split_page(text):
+    # (everything up to and including the page marker, the page's own text, its page number)
+    marker = PAGE_MARKER_RE.search(text)
+    if not marker:
+        return text, "", 0
+    return text[:marker.end()], text[marker.end():], int(DIGITS_RE.search(marker.group()).group())
+
+def template_lines(pages):
+    """Keys of the lines that recur on at least MIN_PAGE_SHARE of a source's pages."""
+    if len(pages) < MIN_SOURCE_PAGES:
+        return set()
+    counts = Counter(key for _, body, page_num in pages for key in {key for line in body.split("\n") for key in template_keys(line, page_num)})
+    threshold = max(2, math.ceil(len(pages) * MIN_PAGE_SHARE))
+    return {key for key, count in counts.items() if count >= threshold}
+
+def content_lines(body):
+    return {normalize_line(line) for line in body.split("\n")} - {""}
+
+def strip_source(pages):
+    """Strip one source's template lines and fold build-up slides into the slide that completes them."""
+    template = template_lines(pages)
+    stripped_lines = 0
+    cleaned = []
+    for head, body, page_num in pages:
+        kept = []
+        for line in body.split("\n"):
+            if any(key in template for key in template_keys(line, page_num)):
+                stripped_lines += 1
+            else:
+                kept.append(line)
+        cleaned.append((head, BLANK_LINES_RE.sub("\n\n", "\n".join(kept))))
+
+    # An incremental build slide's lines all reappear on the next slide, which adds a bullet or two
+    result, collapsed = [], 0
+    for i, (head, body) in enumerate(cleaned):
+        lines = content_lines(body)
+        if i + 1 < len(cleaned) and lines and not any(line.startswith(">[PAGE") for line in lines):
+            if lines <= content_lines(cleaned[i + 1][1]):
+                # Headers before the marker (source name, course) still belong in the text
+                result.append(PAGE_MARKER_RE.split(head)[0])
+                collapsed += 1
+                continue
+        result.append(head + body)
+    return result, stripped_lines, len(template), collapsed
+
+def strip_boilerplate(extracted_md):
+    """
+    Remove slide-template lines and incremental build slides from topic markdown.
+
+    Lines recurring on at least MIN_PAGE_SHARE of a source's pages (deck
+    header, footer, course title, lecturer, "page n of m") are dropped,
+    counted per source since every deck has its own template. A page whose
+    remaining lines all reappear on the next page is a build step of it and
+    is dropped in favour of the fuller page. Page markers of the pages that
+    remain are kept, so chunking still splits on page boundaries.
+    Returns (text, stats).
+    """
+    units = split_units(extracted_md)
+    sources = []
+    for starts_source, text in units:
+        if starts_source or not sources:
+            sources.append([])
+        sources[-1].append(split_page(text))
+
+    parts = []
+    stats = {"lines": 0, "templates": 0, "collapsed": 0}
+    for pages in sources:
+        texts, lines, templates, collapsed = strip_source(pages)
+        parts.extend(texts)
+        stats["lines"] += lines
+        stats["templates"] += templates
+        stats["collapsed"] += collapsed
+    return "".join(parts), stats
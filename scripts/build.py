@@ -0,0 +1,102 @@
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+import build_manifest
+from chapter_pipeline import COURSES, get_target_files, resolve_items, extracted_md_path_for, chapter_path_for, run_batch
+from key_pool import env_api_keys
+from generate_lesson import LESSON_TOKEN_BUDGET
+
+def plan_builds(items):
+    # item -> stages that must rerun, printing why (or that it is up to date)
+    plan = {}
+    for item in items:
+        course, topic = item.split("/")
+        target_files = get_target_files(course, topic)
+        if not target_files:
+            print(f"⚠️ {item}: no source PDFs, skipping")
+            continue
+        stages, reasons = build_manifest.stale_stages(
+            course, topic, target_files, extracted_md_path_for(course, topic), chapter_path_for(course, topic)
+        )
+        if stages:
+            print(f"🔨 {item}: {' + '.join(stages)} ({', '.join(reasons)})")
+            plan[item] = stages
+        else:
+            print(f"✅ {item}: up to date")
+    return plan
+
+def mark_current(items):
+    # Adopt outputs built before the manifest existed, without spending any quota
+    for item in items:
+        course, topic = item.split("/")
+        target_files = get_target_files(course, topic)
+        extracted_md_path = extracted_md_path_for(course, topic)
+        if not target_files or not extracted_md_path.exists():
+            continue
+        build_manifest.record(course, topic, "ocr", build_manifest.ocr_fingerprint(target_files))
+        if chapter_path_for(course, topic).exists():
+            build_manifest.record(course, topic, "lesson", build_manifest.lesson_fingerprint(extracted_md_path))
+        print(f"📌 {item}: recorded current inputs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild only the chapters whose inputs changed since their last build")
+    parser.add_argument("--course", choices=COURSES, help="Course name")
+    parser.add_argument("--topics", default="all", help="Comma-separated topic numbers, or 'all' (default: all)")
+    parser.add_argument("--all-courses", action="store_true", help="Every topic of every course")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages are stale and why")
+    parser.add_argument("--mark-current", action="store_true", help="Record existing outputs as built from the current inputs")
+    parser.add_argument("--ocr-jobs", type=int, default=2, help="Topics in OCR at once (default: 2)")
+    parser.add_argument("--gen-jobs", type=int, default=2, help="Topics generating at once (default: 2)")
+    parser.add_argument("--workers", type=int, default=4, help="Pages to OCR concurrently across a topic's PDFs (default: 4)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local OCR page and lesson response caches")
+    parser.add_argument("--refresh", action="store_true", help="Re-OCR every page, regenerate lessons and refresh both caches")
+    parser.add_argument("--resume", action="store_true", help="Resume interrupted OCR runs from the extraction store")
+    parser.add_argument("--text-layer", action="store_true", help="Skip OCR for plain-prose pages with a usable text layer")
+    parser.add_argument("--dedupe", action="store_true", help="Skip OCR for repeated slides and build steps, reusing the page that contains them")
+    parser.add_argument("--slim", action="store_true", help="Shrink each page (unused resources, oversized images) before upload")
+    parser.add_argument("--shards", type=int, default=1, help="Worker processes that OCR big PDFs in page-range shards (default: 1)")
+    parser.add_argument("--stream", action="store_true", help="Stream lesson generation and validate pages as they arrive")
+    parser.add_argument("--chunk-tokens", type=int, help="Generate topics larger than this many tokens as parallel chunks")
+    parser.add_argument("--repair", action="store_true", help="Fix invalid lesson blocks with small follow-up calls instead of failing the chapter")
+    parser.add_argument("--structured", action="store_true", help="Constrain lesson output to the lesson JSON schema")
+    parser.add_argument("--strip-boilerplate", action="store_true", help="Drop repeated slide headers/footers and build-up slides before lesson generation")
+    parser.add_argument("--token-budget", type=int, default=LESSON_TOKEN_BUDGET, help=f"Refuse lesson requests estimated above this many input tokens (default: {LESSON_TOKEN_BUDGET})")
+
+    args = parser.parse_args()
+    if args.all_courses:
+        courses = COURSES
+    elif args.course:
+        courses = [args.course]
+    else:
+        parser.error("pass --course or --all-courses")
+
+    items = resolve_items(courses, args.topics)
+    if args.mark_current:
+        mark_current(items)
+        return
+
+    plan = plan_builds(items)
+    if not plan:
+        print("🎉 Everything is up to date")
+        return
+    if args.dry_run:
+        print(f"\n📋 {len(plan)}/{len(items)} chapter(s) would be rebuilt")
+        return
+
+    load_dotenv(PROJECT_ROOT / ".env", override=True)
+    if not env_api_keys():
+        print("❌ ERROR: No GEMINI_API_KEY* variables found in .env")
+        sys.exit(1)
+
+    try:
+        run_batch(list(plan), args, plan)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
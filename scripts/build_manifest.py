@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+import gemini_precision_ocr
+import generate_lesson
+from lesson_schema import LESSON_ADAPTER
+from materials_index import file_sha256
+
+PROJECT_ROOT = Path(__file__).parent.parent
+MANIFEST_NAME = "build-manifest.json"
+
+_lock = threading.Lock()
+
+def manifest_path(course: str) -> Path:
+    # Kept next to the committed extractions so a fresh clone knows what is current
+    return PROJECT_ROOT / "input-materials" / course / "extracted" / MANIFEST_NAME
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def optional_file_hash(path: Path):
+    return file_sha256(path) if Path(path).exists() else None
+
+def schema_hash() -> str:
+    return text_hash(json.dumps(LESSON_ADAPTER.json_schema(), sort_keys=True))
+
+def relative(path: Path) -> str:
+    return Path(path).resolve().relative_to(PROJECT_ROOT.resolve()).as_posix()
+
+def ocr_fingerprint(pdf_paths):
+    return {
+        "inputs": {relative(p): file_sha256(p) for p in sorted(pdf_paths, key=relative)},
+        "model": gemini_precision_ocr.MODEL_NAME,
+        "prompt": text_hash(gemini_precision_ocr.OCR_PROMPT),
+    }
+
+def lesson_fingerprint(extracted_md_path: Path):
+    return {
+        "extracted": optional_file_hash(extracted_md_path),
+        "system_prompt": optional_file_hash(generate_lesson.PROMPT_PATH),
+        "model": generate_lesson.MODEL_NAME,
+        "schema": schema_hash(),
+    }
+
+def load(course: str) -> dict:
+    path = manifest_path(course)
+    if not path.exists():
+        return {"chapters": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def record(course: str, topic: str, stage: str, fingerprint: dict):
+    # Read-modify-write under a lock: batch builds finish topics of one course concurrently
+    with _lock:
+        manifest = load(course)
+        manifest["chapters"].setdefault(topic, {})[stage] = fingerprint
+        path = manifest_path(course)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(tmp_path, path)
+
+def stale_stages(course: str, topic: str, pdf_paths, extracted_md_path: Path, chapter_path: Path):
+    """
+    Return (stages, reasons) for the stages of one chapter that must rerun.
+
+    OCR is stale when the extraction is missing or its PDFs, OCR model or OCR
+    prompt changed. Generation is stale when OCR is, when the chapter JSON is
+    missing, or when the extraction, system prompt, model or schema it was
+    built from changed.
+    """
+    recorded = load(course)["chapters"].get(topic, {})
+    stages, reasons = [], []
+
+    if not Path(extracted_md_path).exists():
+        reasons.append("no extraction")
+    elif recorded.get("ocr") is None:
+        reasons.append("no OCR record")
+    else:
+        current = ocr_fingerprint(pdf_paths)
+        for field in ("inputs", "model", "prompt"):
+            if recorded["ocr"].get(field) != current[field]:
+                reasons.append(f"OCR {field} changed")
+    if reasons:
+        stages.append("ocr")
+
+    lesson_reasons = []
+    if stages:
+        lesson_reasons.append("extraction will be rebuilt")
+    elif not Path(chapter_path).exists():
+        lesson_reasons.append("no chapter JSON")
+    elif recorded.get("lesson") is None:
+        lesson_reasons.append("no generation record")
+    else:
+        current = lesson_fingerprint(extracted_md_path)
+        for field in ("extracted", "system_prompt", "model", "schema"):
+            if recorded["lesson"].get(field) != current[field]:
+                lesson_reasons.append(f"{field} changed")
+    if lesson_reasons:
+        stages.append("lesson")
+    return stages, reasons + lesson_reasons
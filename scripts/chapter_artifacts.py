@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import gzip
+import hashlib
+import argparse
+from collections import Counter
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CHAPTERS_DIR = PROJECT_ROOT / "web" / "src" / "data" / "chapters"
+# Served as static files by Next.js; kept out of src/data so the shards never become chapter routes
+ARTIFACTS_DIR = PROJECT_ROOT / "web" / "public" / "chapters"
+MANIFEST_VERSION = 1
+BROTLI_QUALITY = 11
+
+def minify(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def content_hash(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+def write_atomic(path: Path, payload: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+def write_variants(path: Path, payload: bytes):
+    """Write payload plus .gz (and .br with brotli installed) next to it; returns their sizes."""
+    write_atomic(path, payload)
+    # mtime=0 keeps the gzip bytes identical across runs, so unchanged files stay unchanged
+    compressed = {"gzip": (".gz", gzip.compress(payload, 9, mtime=0))}
+    if brotli is not None:
+        compressed["brotli"] = (".br", brotli.compress(payload, quality=BROTLI_QUALITY))
+    sizes = {"bytes": len(payload)}
+    for name, (suffix, data) in compressed.items():
+        write_atomic(path.with_name(path.name + suffix), data)
+        sizes[f"{name}Bytes"] = len(data)
+    return sizes
+
+def chapter_pages(data):
+    # Lessons are a list of {pageTitle, blocks}; hand-written chapters keep their pages under "topics"
+    if isinstance(data, list):
+        return [(page.get("pageTitle"), page) for page in data]
+    return [(topic.get("title"), topic) for topic in data.get("topics", [])]
+
+def emit_chapter_artifacts(chapter_path: Path, output_dir: Path = None, force: bool = False):
+    """
+    Write the web artifacts of one chapter JSON; returns the manifest, or None when already current.
+
+    Under output_dir/<chapter>/: chapter.<hash>.json (minified), one
+    pages/page-NN.<hash>.json shard per lesson page, .gz and .br variants of
+    each, and manifest.json with page titles, block-type counts and byte
+    sizes so the frontend can fetch the manifest first and pages on demand.
+    File names carry a content hash, so they can be cached forever; shards a
+    regenerated chapter no longer references are removed after the new
+    manifest is in place.
+    """
+    chapter_path = Path(chapter_path)
+    output_dir = Path(output_dir) if output_dir else ARTIFACTS_DIR / chapter_path.parent.name
+    raw = chapter_path.read_bytes()
+    source_hash = content_hash(raw)
+    chapter_dir = output_dir / chapter_path.stem
+    manifest_file = chapter_dir / "manifest.json"
+    if not force and manifest_file.exists():
+        try:
+            previous = json.loads(manifest_file.read_text(encoding="utf-8"))
+            if previous.get("sourceHash") == source_hash and previous.get("version") == MANIFEST_VERSION \
+                    and (brotli is None or "brotliBytes" in previous["chapter"]):
+                return None
+        except (OSError, ValueError, KeyError):
+            pass
+
+    data = json.loads(raw)
+    (chapter_dir / "pages").mkdir(parents=True, exist_ok=True)
+    full = minify(data)
+    full_name = f"chapter.{content_hash(full)[:12]}.json"
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "chapter": {"file": full_name, **write_variants(chapter_dir / full_name, full)},
+        "sourceHash": source_hash,
+        "sourceBytes": len(raw),
+        "pages": [],
+    }
+    for index, (title, page) in enumerate(chapter_pages(data), start=1):
+        payload = minify(page)
+        name = f"pages/page-{index:02d}.{content_hash(payload)[:12]}.json"
+        blocks = page.get("blocks", [])
+        manifest["pages"].append({
+            "index": index,
+            "title": title,
+            "file": name,
+            "blockCount": len(blocks),
+            "blockTypes": dict(Counter(block.get("type") for block in blocks)),
+            **write_variants(chapter_dir / name, payload),
+        })
+    write_atomic(manifest_file, minify(manifest))
+
+    referenced = {manifest["chapter"]["file"]} | {page["file"] for page in manifest["pages"]}
+    for path in [*chapter_dir.glob("chapter.*.json*"), *(chapter_dir / "pages").glob("page-*.json*")]:
+        if path.relative_to(chapter_dir).as_posix().removesuffix(".gz").removesuffix(".br") not in referenced:
+            path.unlink()
+    return manifest
+
+def describe(manifest):
+    chapter = manifest["chapter"]
+    compressed = chapter.get("brotliBytes", chapter["gzipBytes"])
+    return (f"{len(manifest['pages'])} page shard(s), {manifest['sourceBytes'] / 1024:.0f} KB → "
+            f"{chapter['bytes'] / 1024:.0f} KB minified, {compressed / 1024:.0f} KB {'brotli' if 'brotliBytes' in chapter else 'gzip'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Write minified, per-page and precompressed web artifacts for chapter JSON")
+    parser.add_argument("--course", help="Only this course's chapters")
+    parser.add_argument("--chapter", help="A single chapter JSON file")
+    parser.add_argument("--force", action="store_true", help="Rewrite artifacts even when the chapter is unchanged")
+    args = parser.parse_args()
+
+    if args.chapter:
+        chapter_paths = [Path(args.chapter)]
+    else:
+        courses = [CHAPTERS_DIR / args.course] if args.course else sorted(p for p in CHAPTERS_DIR.iterdir() if p.is_dir())
+        chapter_paths = [path for course_dir in courses for path in sorted(course_dir.glob("chapter-*.json"))]
+    if not chapter_paths:
+        print("❌ No chapter JSON found")
+        sys.exit(1)
+    if brotli is None:
+        print("⚠️ brotli is not installed, writing gzip variants only (pip install brotli)")
+
+    written = 0
+    for chapter_path in chapter_paths:
+        manifest = emit_chapter_artifacts(chapter_path, force=args.force)
+        if manifest is None:
+            print(f"✅ {chapter_path.parent.name}/{chapter_path.name} is up to date")
+            continue
+        written += 1
+        print(f"📦 {chapter_path.parent.name}/{chapter_path.name}: {describe(manifest)}")
+    print(f"🎉 Wrote artifacts for {written}/{len(chapter_paths)} chapter(s) under {ARTIFACTS_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import sys
+import json
+from pathlib import Path
+from generate_lesson import generate_lesson, open_lesson_cache
+from gemini_precision_ocr import extract_pdfs, open_cache, too_many_failures
+from key_pool import default_pool
+from pipeline_scheduler import PipelineScheduler
+from materials_index import default_index
+import build_manifest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DUPLICATES_FILE = PROJECT_ROOT / "input-materials" / "duplicates.json"
+
+def load_canonical_copies():
+    # duplicate path -> (canonical path, sha256), as written by organize_materials.py --dedupe --write
+    if not DUPLICATES_FILE.exists():
+        return {}
+    root = DUPLICATES_FILE.parent
+    copies = {}
+    for group in json.loads(DUPLICATES_FILE.read_text(encoding="utf-8"))["groups"]:
+        for duplicate in group["duplicates"]:
+            copies[root / duplicate] = (root / group["canonical"], group["sha256"])
+    return copies
+
+def get_target_files(course: str, topic: str):
+    """
+    Source PDFs for a topic across lecture-slides, ai-slides, exercises and exams, nested folders included.
+
+    Byte-identical copies collapse to one file: a recorded duplicate is swapped
+    for its canonical copy (whose OCR pages are then already cached), and
+    repeats within the topic are dropped.
+    """
+    index = default_index()
+    copies = load_canonical_copies()
+    target_files, seen = [], set()
+    for path in index.files_for(course, topic):
+        entry = index.entry_for(path)
+        canonical, sha256 = copies.get(path, (None, None))
+        canonical_entry = index.entry_for(canonical) if canonical is not None and canonical.exists() else None
+        # Only trust the record while both files still have the recorded contents
+        digest = entry["sha256"] if entry else str(path)
+        if digest in seen:
+            print(f"♻️ Skipping {path.name}, same contents as another topic {topic} source")
+            continue
+        seen.add(digest)
+        if canonical_entry and entry and entry["sha256"] == sha256 == canonical_entry["sha256"]:
+            print(f"♻️ {path.name} is a copy of {canonical.relative_to(DUPLICATES_FILE.parent)}, using that")
+            path = canonical
+        target_files.append(path)
+    return target_files
+
+COURSES = ['math', 'micro', 'acct', 'orgbh']
+
+class ChapterBuildError(Exception):
+    pass
+
+def discover_topics(course: str):
+    # Every topic number that at least one source PDF is filed under
+    return default_index().topics(course)
+
+def extracted_md_path_for(course: str, topic: str) -> Path:
+    return PROJECT_ROOT / "input-materials" / course / "extracted" / f"topic-{topic}-extracted.md"
+
+def chapter_path_for(course: str, topic: str) -> Path:
+    return PROJECT_ROOT / "web" / "src" / "data" / "chapters" / course / f"chapter-{topic}.json"
+
+def run_ocr_stage(course: str, topic: str, args, target_files=None, force=False):
+    target_files = target_files or get_target_files(course, topic)
+    if not target_files:
+        raise ChapterBuildError(f"No PDF files found for topic {topic} in {course} input-materials")
+
+    extracted_md_path = extracted_md_path_for(course, topic)
+    if not extracted_md_path.exists() or force or args.resume or args.refresh:
+        print(f"\n🚀 Running OCR on {len(target_files)} file(s) for {course} topic {topic}...")
+        summaries = extract_pdfs(
+            target_files, course, topic, default_pool(),
+            workers=args.workers, cache=open_cache(args.no_cache), refresh=args.refresh, resume=args.resume,
+            text_layer=args.text_layer, shards=args.shards, slim=args.slim, dedupe=args.dedupe, retire_missing=True
+        )
+        if args.text_layer:
+            saved = sum(summary["text_layer_pages"] for summary in summaries)
+            print(f"📉 Text layer saved {saved} API call(s) for topic {topic}")
+        if args.dedupe:
+            saved = sum(summary["reused_pages"] for summary in summaries)
+            print(f"🪞 Near-duplicate detection saved {saved} API call(s) for topic {topic}")
+        for summary in summaries:
+            if too_many_failures(summary):
+                print(f"⚠️ OCR failed for {Path(summary['pdf']).name}, continuing...")
+        if extracted_md_path.exists():
+            build_manifest.record(course, topic, "ocr", build_manifest.ocr_fingerprint(target_files))
+    else:
+        print(f"✅ Found existing extraction: {extracted_md_path.name}. Skipping OCR.")
+
+    if not extracted_md_path.exists():
+        raise ChapterBuildError(f"Extracted markdown not found at {extracted_md_path}. OCR must have produced no output.")
+    return extracted_md_path
+
+def run_lesson_stage(course: str, topic: str, args):
+    print(f"\n🧠 Generating Lesson JSON for {course} topic {topic}...")
+    extracted_md_path = extracted_md_path_for(course, topic)
+    # Fingerprint the inputs before the call so edits made mid-generation still count as changes
+    fingerprint = build_manifest.lesson_fingerprint(extracted_md_path)
+    try:
+        output_path = generate_lesson(
+            course=course,
+            topic=topic,
+            extracted_md_path=extracted_md_path,
+            pool=default_pool(),
+            stream=args.stream,
+            chunk_tokens=args.chunk_tokens,
+            cache=open_lesson_cache(args.no_cache),
+            refresh=args.refresh,
+            repair=args.repair,
+            structured=args.structured,
+            strip=args.strip_boilerplate,
+            token_budget=args.token_budget
+        )
+    except Exception as e:
+        raise ChapterBuildError(f"Lesson generation failed: {e}") from e
+    build_manifest.record(course, topic, "lesson", fingerprint)
+    return output_path
+
+def resolve_items(courses, topic_arg):
+    items = []
+    for course in courses:
+        topics = discover_topics(course) if topic_arg == "all" else [t.strip().zfill(2) for t in topic_arg.split(",")]
+        items.extend(f"{course}/{topic}" for topic in topics)
+    return items
+
+def run_batch(items, args, plan=None):
+    """
+    Build items ("course/topic") through the pipelined OCR -> lesson scheduler.
+
+    plan optionally maps an item to the stages it actually needs; stages
+    left out are passed through without work. Exits 1 if any item failed.
+    """
+    if not items:
+        print("❌ ERROR: No topics found to build")
+        sys.exit(1)
+
+    def stage(name, fn):
+        def run(item):
+            if plan is not None and name not in plan[item]:
+                return
+            course, topic = item.split("/")
+            fn(course, topic)
+        return run
+
+    print(f"📦 Building {len(items)} chapter(s): OCR ×{args.ocr_jobs}, generation ×{args.gen_jobs}")
+    force_ocr = plan is not None
+    scheduler = PipelineScheduler([
+        ("ocr", stage("ocr", lambda course, topic: run_ocr_stage(course, topic, args, force=force_ocr)), args.ocr_jobs),
+        ("lesson", stage("lesson", lambda course, topic: run_lesson_stage(course, topic, args)), args.gen_jobs),
+    ])
+    _, errors = scheduler.run(items)
+
+    for item, error in errors.items():
+        print(f"❌ {item}: {error}")
+    print(f"🎉 {len(items) - len(errors)}/{len(items)} chapters built")
+    if errors:
+        sys.exit(1)
@@ -1,54 +1,62 @@
-import os
 import sys
 import argparse
-import subprocess
-import re
 from pathlib import Path
 from dotenv import load_dotenv
 
 PROJECT_ROOT = Path(__file__).parent.parent
 
-# Add scripts directory to sys.path so we can import generate_lesson
+# Add scripts directory to sys.path so we can import the pipeline modules
 sys.path.append(str(PROJECT_ROOT / "scripts"))
-from generate_lesson import generate_lesson
-
-def get_target_files(course: str, topic: str):
-    base_dir = PROJECT_ROOT / "input-materials" / course
-    target_files = []
-    
-    # Check all subdirectories: lecture-slides, ai-slides, exercises, exams
-    subdirs = ["lecture-slides", "ai-slides", "exercises", "exams"]
-    
-    for subdir in subdirs:
-        dir_path = base_dir / subdir
-        if dir_path.exists() and dir_path.is_dir():
-            for file in dir_path.glob("*.pdf"):
-                # We expect the filename to contain the topic number padded, e.g., '05'
-                # A simple check is if f"{topic}" is in the filename. 
-                # Better check: searching exactly for the topic structure.
-                # Assuming the rules defined: "lecture-{topic}-", "{topic}-", "exercise-{topic}-"
-                if re.search(rf'(?:^|[-_]){re.escape(topic)}[a-z]?[-_.]', file.name):
-                    target_files.append(file)
-                    
-    return target_files
+from chapter_pipeline import COURSES, ChapterBuildError, get_target_files, run_ocr_stage, run_lesson_stage, resolve_items, run_batch
+from key_pool import env_api_keys
+from generate_lesson import LESSON_TOKEN_BUDGET
 
 def main():
     parser = argparse.ArgumentParser(description="Orchestrate Sikumnik chapter creation")
-    parser.add_argument("--course", required=True, choices=['math', 'micro', 'acct', 'orgbh'], help="Course name")
-    parser.add_argument("--topic", required=True, help="Topic number (e.g., 05)")
+    parser.add_argument("--course", choices=COURSES, help="Course name")
+    parser.add_argument("--topic", help="Topic number (e.g., 05)")
+    parser.add_argument("--topics", help="Batch mode: comma-separated topic numbers, or 'all'")
+    parser.add_argument("--all-courses", action="store_true", help="Batch mode: every topic of every course")
+    parser.add_argument("--ocr-jobs", type=int, default=2, help="Batch mode: topics in OCR at once (default: 2)")
+    parser.add_argument("--gen-jobs", type=int, default=2, help="Batch mode: topics generating at once (default: 2)")
+    parser.add_argument("--workers", type=int, default=4, help="Pages to OCR concurrently across the topic's PDFs (default: 4)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local OCR page and lesson response caches")
+    parser.add_argument("--refresh", action="store_true", help="Re-OCR every page, regenerate lessons and refresh both caches")
+    parser.add_argument("--resume", action="store_true", help="Resume interrupted OCR runs from the extraction store")
+    parser.add_argument("--text-layer", action="store_true", help="Skip OCR for plain-prose pages with a usable text layer")
+    parser.add_argument("--dedupe", action="store_true", help="Skip OCR for repeated slides and build steps, reusing the page that contains them")
+    parser.add_argument("--slim", action="store_true", help="Shrink each page (unused resources, oversized images) before upload")
+    parser.add_argument("--shards", type=int, default=1, help="Worker processes that OCR big PDFs in page-range shards (default: 1)")
+    parser.add_argument("--stream", action="store_true", help="Stream lesson generation and validate pages as they arrive")
+    parser.add_argument("--chunk-tokens", type=int, help="Generate topics larger than this many tokens as parallel chunks")
+    parser.add_argument("--repair", action="store_true", help="Fix invalid lesson blocks with small follow-up calls instead of failing the chapter")
+    parser.add_argument("--structured", action="store_true", help="Constrain lesson output to the lesson JSON schema")
+    parser.add_argument("--strip-boilerplate", action="store_true", help="Drop repeated slide headers/footers and build-up slides before lesson generation")
+    parser.add_argument("--token-budget", type=int, default=LESSON_TOKEN_BUDGET, help=f"Refuse lesson requests estimated above this many input tokens (default: {LESSON_TOKEN_BUDGET})")
     
     args = parser.parse_args()
-    course = args.course
-    topic = args.topic.zfill(2)
+    if args.all_courses:
+        courses = COURSES
+    elif args.course and (args.topics or args.topic):
+        courses = [args.course]
+    else:
+        parser.error("pass --course with --topic/--topics, or --all-courses")
     
     load_dotenv(PROJECT_ROOT / ".env", override=True)
     
-    api_key = os.getenv("GEMINI_API_KEY")
-    api_key_2 = os.getenv("GEMINI_API_KEY_2")
-    
-    if not api_key and not api_key_2:
-        print("❌ ERROR: Neither GEMINI_API_KEY nor GEMINI_API_KEY_2 found in .env")
+    if not env_api_keys():
+        print("❌ ERROR: No GEMINI_API_KEY* variables found in .env")
         sys.exit(1)
+
+    if args.all_courses or args.topics:
+        try:
+            run_batch(resolve_items(courses, args.topics or "all"), args)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        return
+
+    course = args.course
+    topic = args.topic.zfill(2)
         
     target_files = get_target_files(course, topic)
     
@@ -59,49 +67,14 @@ def main():
     print(f"📂 Found {len(target_files)} files for topic {topic}:")
     for f in target_files:
         print(f"   - {f.name}")
-        
-    extracted_md_path = PROJECT_ROOT / "input-materials" / course / "extracted" / f"topic-{topic}-extracted.md"
-    ocr_script = PROJECT_ROOT / "scripts" / "gemini_precision_ocr.py"
-    
-    if not extracted_md_path.exists():
-        for pdf_file in target_files:
-            print(f"\n🚀 Running OCR on {pdf_file.name}...")
-            cmd = [
-                sys.executable, str(ocr_script),
-                "--pdf", str(pdf_file),
-                "--course", course,
-                "--topic", topic
-            ]
-            
-            if api_key:
-                cmd.extend(["--key", api_key])
-            elif api_key_2:
-                cmd.extend(["--key", api_key_2])
-                
-            result = subprocess.run(cmd)
-            if result.returncode != 0:
-                print(f"⚠️ OCR failed for {pdf_file.name}, continuing...")
-    else:
-        print(f"✅ Found existing extraction: {extracted_md_path.name}. Skipping OCR.")
-            
-    extracted_md_path = PROJECT_ROOT / "input-materials" / course / "extracted" / f"topic-{topic}-extracted.md"
-    
-    if not extracted_md_path.exists():
-        print(f"❌ ERROR: Extracted markdown not found at {extracted_md_path}. OCR must have produced no output.")
-        sys.exit(1)
-        
-    print("\n🧠 Generating Lesson JSON...")
-    
+
     try:
-        output_json_path = generate_lesson(
-            course=course,
-            topic=topic,
-            extracted_md_path=extracted_md_path,
-            api_key=api_key,
-            api_key_2=api_key_2
-        )
-    except Exception as e:
-        print(f"\n❌ ERROR during lesson generation: {e}")
+        run_ocr_stage(course, topic, args, target_files)
+        output_json_path = run_lesson_stage(course, topic, args)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except ChapterBuildError as e:
+        print(f"\n❌ ERROR: {e}")
         sys.exit(1)
         
     source_filenames = ", ".join([f.name for f in target_files])
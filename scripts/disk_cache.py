@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_ROOT = PROJECT_ROOT / ".cache"
+
+def cache_key(*parts):
+    # Length-prefix every part so ("ab", "c") and ("a", "bc") never collide
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(str(len(part)).encode("ascii") + b":")
+        digest.update(part)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Content-addressed JSON cache on disk.
+
+    Entries live at <root>/<key[:2]>/<key>.json. A hit bumps the entry's mtime,
+    so evicting the oldest mtimes first gives LRU behaviour once the cache
+    grows past max_bytes. Safe to share between threads of one process.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, ttl_seconds: float = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.json"
+
+    def _entries(self):
+        if not self.root.exists():
+            return []
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _current_size(self):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if self.ttl_seconds is not None and time.time() - stat.st_mtime > self.ttl_seconds:
+                self.delete(key)
+                return None
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(payload)
+        with self._lock:
+            # Sized before the replace: a first scan afterwards would already count the new entry
+            size = self._current_size()
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._size = size - previous + len(payload)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                if self._size is not None:
+                    self._size -= size
+            except OSError:
+                pass
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction doesn't run on every write
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, entry_path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(entry_path)
+                size -= entry_size
+            except OSError:
+                pass
+        self._size = size
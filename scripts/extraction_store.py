@@ -0,0 +1,298 @@
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+STORE_NAME = "extractions.sqlite"
+# Seconds a writer waits for another process's transaction before giving up
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    topic TEXT NOT NULL,
+    source TEXT NOT NULL,
+    display TEXT NOT NULL,
+    total_pages INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    registered_at REAL NOT NULL,
+    PRIMARY KEY (topic, source)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    topic TEXT NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    text TEXT NOT NULL,
+    sha256 TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (topic, source, page)
+);
+"""
+
+# A failed retry never replaces text that was already extracted
+UPSERT_PAGE = """
+INSERT INTO pages (topic, source, page, status, text, sha256, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (topic, source, page) DO UPDATE SET
+    status = excluded.status, text = excluded.text, sha256 = excluded.sha256, updated_at = excluded.updated_at
+WHERE NOT (pages.status = 'ok' AND excluded.status != 'ok')
+"""
+
+# The layout render_markdown writes, which is also what topic markdown looked like before the store
+SECTION_RE = re.compile(r"\n\n---\n## Additional Source: [^\n]*\n\n")
+SOURCE_LINE_RE = re.compile(r"^Source: (.+)$", re.MULTILINE)
+PAGE_RE = re.compile(r"\n\n--- PAGE (\d+) ---\n\n")
+FAILED_PAGE_RE = re.compile(r"\n>\[PAGE \d+ EXTRACTION FAILED\]\n")
+
+def store_path(course: str) -> Path:
+    return PROJECT_ROOT / "input-materials" / course / "extracted" / STORE_NAME
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text else None
+
+def source_name(display: str) -> str:
+    # Markdown written on Windows keeps backslash paths
+    return re.split(r"[\\/]", display)[-1]
+
+def parse_topic_markdown(text: str):
+    """(display, {page: text, or None if it failed}) for each source section of rendered topic markdown."""
+    sections = []
+    for section in SECTION_RE.split(text):
+        parts = PAGE_RE.split(section)
+        source = SOURCE_LINE_RE.search(parts[0])
+        if source and len(parts) > 1:
+            pages = {int(page): None if FAILED_PAGE_RE.fullmatch(body) else body for page, body in zip(parts[1::2], parts[2::2])}
+            sections.append((source.group(1).strip(), pages))
+    return sections
+
+class ExtractionStore:
+    """
+    Per-course SQLite store of every OCR'd page: one row per (topic, source, page).
+
+    Each row keeps the status, text, its sha256 and when it was first and
+    last written. Every write is its own committed transaction in WAL mode,
+    so a crash or Ctrl-C loses at most the pages still in flight, readers
+    never block writers, and shard processes can all write into the same
+    file. Connections are per thread. The topic markdown is a view rendered
+    from the rows, never appended to.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=FULL")
+            self._local.db = db
+        return db
+
+    def topic(self, topic: str) -> "TopicExtraction":
+        return TopicExtraction(self, topic)
+
+    def topics(self):
+        rows = self._connect().execute("SELECT DISTINCT topic FROM sources ORDER BY topic")
+        return [row["topic"] for row in rows]
+
+    def sources(self, topic: str):
+        rows = self._connect().execute(
+            "SELECT source, display, total_pages, registered_at FROM sources WHERE topic = ? ORDER BY position", (topic,)
+        )
+        return [dict(row) for row in rows]
+
+    def page(self, topic: str, page: int, source: str = None):
+        """One page's record, from `source` or else the topic's first source that has the page; None if missing."""
+        rows = self._connect().execute(
+            "SELECT p.* FROM pages p JOIN sources s USING (topic, source) WHERE p.topic = ? AND p.page = ? "
+            "AND (? IS NULL OR p.source = ? OR s.display LIKE '%' || ?) ORDER BY s.position LIMIT 1",
+            (topic, page, source, source, source),
+        ).fetchone()
+        return dict(rows) if rows else None
+
+    def pages(self, topic: str, source: str = None):
+        # Every record of a topic in markdown order, without loading the whole topic at once
+        cursor = self._connect().execute(
+            "SELECT p.* FROM pages p JOIN sources s USING (topic, source) WHERE p.topic = ? AND (? IS NULL OR p.source = ?) "
+            "ORDER BY s.position, p.page",
+            (topic, source, source),
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def register_source(self, topic: str, source: str, display: str, total_pages: int):
+        # Registration order is kept as the section order of the markdown
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT OR IGNORE INTO sources VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM sources WHERE topic = ?), ?)",
+                (topic, source, display, total_pages, topic, time.time()),
+            )
+            db.execute("UPDATE sources SET display = ?, total_pages = ? WHERE topic = ? AND source = ?",
+                       (display, total_pages, topic, source))
+            db.execute("COMMIT")
+
+    def claim_source(self, topic: str, source: str, alias: str):
+        """Move the rows stored under `alias` onto `source`, unless `source` already has its own."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            if db.execute("SELECT 1 FROM sources WHERE topic = ? AND source = ?", (topic, source)).fetchone() is None:
+                if db.execute("UPDATE sources SET source = ? WHERE topic = ? AND source = ?", (source, topic, alias)).rowcount:
+                    db.execute("UPDATE pages SET source = ? WHERE topic = ? AND source = ?", (source, topic, alias))
+            db.execute("COMMIT")
+
+    def keep_sources(self, topic: str, sources):
+        """Delete the topic's sources that are not in `sources`, with their pages, and order the rest as given; returns the retired ones."""
+        placeholders = ", ".join("?" * len(sources))
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            retired = [dict(row) for row in db.execute(
+                f"SELECT source, display FROM sources WHERE topic = ? AND source NOT IN ({placeholders}) ORDER BY position",
+                (topic, *sources),
+            )]
+            db.execute(f"DELETE FROM pages WHERE topic = ? AND source NOT IN ({placeholders})", (topic, *sources))
+            db.execute(f"DELETE FROM sources WHERE topic = ? AND source NOT IN ({placeholders})", (topic, *sources))
+            for position, source in enumerate(sources, start=1):
+                db.execute("UPDATE sources SET position = ? WHERE topic = ? AND source = ?", (position, topic, source))
+            db.execute("COMMIT")
+        return retired
+
+    def record_page(self, topic: str, source: str, page: int, text):
+        ts = time.time()
+        self._connect().execute(UPSERT_PAGE, (topic, source, page, "ok" if text else "failed", text or "", text_hash(text), ts, ts))
+
+    def adopt_markdown(self, topic: str, text: str):
+        """Split topic markdown into pages under `legacy:<file name>` sources in one transaction; returns the sources adopted."""
+        sections = parse_topic_markdown(text)
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            ts = time.time()
+            for display, pages in sections:
+                source = f"legacy:{source_name(display)}"
+                db.execute(
+                    "INSERT OR IGNORE INTO sources VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM sources WHERE topic = ?), ?)",
+                    (topic, source, display, max(pages), topic, ts),
+                )
+                for page, page_text in pages.items():
+                    db.execute(UPSERT_PAGE, (topic, source, page, "ok" if page_text else "failed", page_text or "", text_hash(page_text), ts, ts))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return len(sections)
+
+class TopicExtraction:
+    """One topic's slice of an ExtractionStore, with the interface the OCR stage uses."""
+
+    def __init__(self, store: ExtractionStore, topic: str):
+        self.store = store
+        self.topic = topic
+
+    def adopt_legacy_markdown(self, markdown_path: Path):
+        # Markdown from before the store becomes legacy:<file name> sources, which the PDFs passed
+        # then claim by file name (so --resume reuses their pages) or retire
+        if self.store.sources(self.topic) or not markdown_path.exists():
+            return
+        adopted = self.store.adopt_markdown(self.topic, markdown_path.read_text(encoding="utf-8"))
+        if adopted:
+            print(f"📥 Split {markdown_path.name} into {adopted} source(s) of pages")
+        else:
+            print(f"⚠️ {markdown_path.name} has no Source:/--- PAGE n --- sections; topic {self.topic} is rebuilt from OCR alone")
+
+    def register_source(self, source: str, display: str, total_pages: int):
+        self.store.register_source(self.topic, source, display, total_pages)
+
+    def claim_source(self, source: str, alias: str):
+        self.store.claim_source(self.topic, source, alias)
+
+    def keep_sources(self, sources):
+        return self.store.keep_sources(self.topic, list(dict.fromkeys(sources)))
+
+    def record_page(self, source: str, page: int, text):
+        self.store.record_page(self.topic, source, page, text)
+
+    def completed_pages(self, source: str):
+        return {record["page"] for record in self.store.pages(self.topic, source) if record["status"] == "ok"}
+
+    def page_texts(self, source: str):
+        return {record["page"]: record["text"] for record in self.store.pages(self.topic, source) if record["status"] == "ok"}
+
+    def render_markdown(self, course: str) -> str:
+        parts = [f"# Extracted Content: {course} Topic {self.topic}\n\n"]
+        for index, entry in enumerate(self.store.sources(self.topic)):
+            if index > 0:
+                parts.append(f"\n\n---\n## Additional Source: {source_name(entry['display'])}\n\n")
+            parts.append(f"Source: {entry['display']}\nCourse: {course} | Topic: {self.topic}\n\n")
+            texts = self.page_texts(entry["source"])
+            for p in range(1, entry["total_pages"] + 1):
+                parts.append(f"\n\n--- PAGE {p} ---\n\n")
+                parts.append(texts[p] if p in texts else f"\n>[PAGE {p} EXTRACTION FAILED]\n")
+        return "".join(parts)
+
+    def write_markdown(self, output_file: Path, course: str):
+        # Write-then-rename so readers never see a half-written topic file
+        tmp_file = output_file.with_name(output_file.name + ".tmp")
+        tmp_file.write_text(self.render_markdown(course), encoding="utf-8")
+        os.replace(tmp_file, output_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a course's extraction store or regenerate topic markdown from it")
+    parser.add_argument("--course", required=True, help="Course name")
+    parser.add_argument("--topic", help="Topic number (default: list every topic)")
+    parser.add_argument("--page", type=int, help="Print this page's extracted text")
+    parser.add_argument("--source", help="PDF the page belongs to (default: the topic's first source)")
+    parser.add_argument("--markdown", action="store_true", help="Rewrite the topic's extracted markdown from the store")
+    args = parser.parse_args()
+
+    path = store_path(args.course)
+    if not path.exists():
+        print(f"❌ No extraction store at {path}")
+        sys.exit(1)
+    store = ExtractionStore(path)
+
+    if not args.topic:
+        for topic in store.topics():
+            sources = store.sources(topic)
+            done = sum(record["status"] == "ok" for record in store.pages(topic))
+            total = sum(entry["total_pages"] for entry in sources)
+            print(f"   topic {topic}: {len(sources)} source(s), {done}/{total} pages extracted")
+        return
+
+    if args.page:
+        record = store.page(args.topic, args.page, args.source)
+        if record is None:
+            print(f"❌ Page {args.page} of topic {args.topic} is not in the store")
+            sys.exit(1)
+        if record["status"] != "ok":
+            print(f"⚠️ Page {args.page} failed extraction; rerun OCR with --pages {args.page}")
+            sys.exit(1)
+        print(record["text"])
+        return
+
+    extraction = store.topic(args.topic)
+    if args.markdown:
+        output_file = path.parent / f"topic-{args.topic}-extracted.md"
+        extraction.write_markdown(output_file, args.course)
+        print(f"💾 Wrote {output_file}")
+        return
+    for entry in store.sources(args.topic):
+        failed = [record["page"] for record in store.pages(args.topic, entry["source"]) if record["status"] != "ok"]
+        done = len(extraction.completed_pages(entry["source"]))
+        print(f"   {source_name(entry['display'])}: {done}/{entry['total_pages']} pages"
+              + (f", failed: {', '.join(map(str, failed))}" if failed else ""))
+
+if __name__ == "__main__":
+    main()
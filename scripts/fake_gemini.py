@@ -0,0 +1,168 @@
+import json
+import math
+import time
+import random
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from lesson_repair import REPAIR_INSTRUCTION
+
+# Roughly what Gemini bills for one rendered PDF page
+PDF_PAGE_TOKENS = 258
+CHARS_PER_TOKEN = 3
+STREAM_CHUNK_CHARS = 400
+
+class FakeApiError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+def parse_latency(spec):
+    """
+    Latency sampler from "fixed:S", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA" (seconds).
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+def load_replays(replay_dir):
+    # *.md files answer OCR calls; *.json files (raw responses or lesson cache entries) answer lesson calls
+    ocr, lessons = [], []
+    for path in sorted(Path(replay_dir).rglob("*")):
+        if path.suffix == ".md":
+            ocr.append(path.read_text(encoding="utf-8"))
+        elif path.suffix == ".json":
+            text = path.read_text(encoding="utf-8")
+            try:
+                value = json.loads(text)
+            except ValueError:
+                continue
+            lessons.append(value["text"] if isinstance(value, dict) and "text" in value else text)
+    return ocr, lessons
+
+def synthetic_page_text(page_num):
+    return (f"# עמוד {page_num}\n\n"
+            + "הגדרה: פונקציה היא התאמה בין קבוצות. " * 30
+            + f"\n\n$$f(x) = x^{{{page_num % 9 + 1}}}$$\n")
+
+def synthetic_lesson(input_chars):
+    # About one lesson page per 3000 input characters, every block valid against lesson_schema
+    pages = []
+    for i in range(max(1, min(40, input_chars // 3000))):
+        blocks = [
+            {"type": "text", "formalText": "טקסט פורמלי " * 20, "streetNarrator": "בשפה פשוטה " * 10},
+            {"type": "definition", "term": f"מושג {i + 1}", "definition": "הגדרה " * 15},
+            {"type": "exam-tip", "content": "טיפ למבחן " * 10},
+            {"type": "topic-summary", "content": "סיכום " * 15},
+        ]
+        if i == 0:
+            blocks.insert(0, {"type": "hook", "opener": "האם ידעת ש...?"})
+        pages.append({"pageTitle": f"נושא {i + 1}", "blocks": blocks})
+    return json.dumps(pages, ensure_ascii=False)
+
+class FakeGemini:
+    """
+    Offline stand-in for genai.Client, for benchmarks and tests.
+
+    Pass fake.client as KeyPool's client_factory. Every call sleeps for a
+    sampled latency (plus the upload time of its payload at upload_mbps, if
+    set) and answers by request kind: OCR calls (a PDF part in contents)
+    get page markdown, repair calls a valid block, lesson calls a lesson
+    JSON array. Fault rates inject 429s, truncated JSON, malformed
+    JSON and off-schema blocks. With replay_dir, recorded responses are
+    served round-robin instead of synthetic ones.
+    """
+
+    def __init__(self, latency="lognormal:0.05,0.5", rate_429=0.0, truncate=0.0, malformed=0.0, offschema=0.0,
+                 replay_dir=None, seed=None, upload_mbps=None):
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.truncate = truncate
+        self.malformed = malformed
+        self.offschema = offschema
+        self.upload_mbps = upload_mbps
+        self.ocr_replays, self.lesson_replays = load_replays(replay_dir) if replay_dir else ([], [])
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "429": 0, "truncated": 0, "malformed": 0, "offschema": 0, "upload_bytes": 0}
+
+    def client(self, api_key=None):
+        return SimpleNamespace(models=FakeModels(self))
+
+    def _inject(self, fault, rate):
+        with self._lock:
+            hit = self._rng.random() < rate
+            if hit:
+                self.stats[fault] += 1
+            return hit
+
+    def respond(self, contents, config):
+        """Return (text, latency, prompt_tokens) for one request, or raise an injected 429."""
+        with self._lock:
+            latency = self.sample_latency(self._rng)
+            self.stats["calls"] += 1
+            call_num = self.stats["calls"]
+        if self._inject("429", self.rate_429):
+            time.sleep(latency * 0.1)
+            raise FakeApiError(429, "RESOURCE_EXHAUSTED (injected by fake_gemini)")
+
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt_chars = sum(len(part) for part in parts if isinstance(part, str))
+        pdf_parts = sum(1 for part in parts if not isinstance(part, str))
+        upload_bytes = prompt_chars + sum(len(part.inline_data.data) for part in parts if not isinstance(part, str))
+        with self._lock:
+            self.stats["upload_bytes"] += upload_bytes
+        if self.upload_mbps:
+            latency += upload_bytes * 8 / (self.upload_mbps * 1e6)
+        system_instruction = getattr(config, "system_instruction", None) or ""
+        prompt_tokens = (prompt_chars + len(system_instruction)) // CHARS_PER_TOKEN + pdf_parts * PDF_PAGE_TOKENS
+
+        if pdf_parts:
+            replays = self.ocr_replays
+            text = replays[call_num % len(replays)] if replays else synthetic_page_text(call_num)
+            return text, latency, prompt_tokens
+        if system_instruction == REPAIR_INSTRUCTION:
+            return json.dumps({"type": "text", "formalText": "תוקן", "streetNarrator": "תוקן"}, ensure_ascii=False), latency, prompt_tokens
+
+        replays = self.lesson_replays
+        text = replays[call_num % len(replays)] if replays else synthetic_lesson(prompt_chars)
+        if self._inject("offschema", self.offschema):
+            # Drop a required field from the first text block, so --repair has work to do
+            text = text.replace('"formalText": ', '"formalTextX": ', 1)
+        if self._inject("malformed", self.malformed):
+            text = text.replace("}", ",}", 1)
+        if self._inject("truncated", self.truncate):
+            with self._lock:
+                text = text[:int(len(text) * self._rng.uniform(0.3, 0.9))]
+        return text, latency, prompt_tokens
+
+def _usage(prompt_tokens, text):
+    output_tokens = len(text) // CHARS_PER_TOKEN
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                           total_token_count=prompt_tokens + output_tokens)
+
+class FakeModels:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def generate_content(self, model, contents, config=None):
+        text, latency, prompt_tokens = self.fake.respond(contents, config)
+        time.sleep(latency)
+        return SimpleNamespace(text=text, usage_metadata=_usage(prompt_tokens, text))
+
+    def generate_content_stream(self, model, contents, config=None):
+        text, latency, prompt_tokens = self.fake.respond(contents, config)
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        # A fifth of the latency before the first token, the rest spread over the chunks
+        time.sleep(latency * 0.2)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(latency * 0.8 / len(chunks))
+            last = i == len(chunks) - 1
+            yield SimpleNamespace(text=chunk, usage_metadata=_usage(prompt_tokens, text) if last else None)
@@ -1,14 +1,21 @@
 import os
 import io
-import time
 import re
 import argparse
 import sys
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 from pypdf import PdfReader, PdfWriter
 from pathlib import Path
+from disk_cache import CACHE_ROOT, DiskCache, cache_key
+from extraction_store import STORE_NAME, ExtractionStore, source_name
+from key_pool import KeyPool, env_api_keys
+from materials_index import file_sha256
+from near_duplicates import near_duplicate_pages
+from page_slimmer import PageSlimmer, open_slim_cache
+from text_layer import text_layer_content
 
 load_dotenv(override=True)
 
@@ -17,121 +24,384 @@ PROJECT_ROOT = Path(__file__).parent.parent
 # 1. Configuration
 MODEL_NAME = "gemini-2.5-flash"
 MAX_RETRIES = 5
+# Rough input size of one single-page PDF plus prompt, charged against the TPM bucket up front
+PAGE_TOKEN_ESTIMATE = 1500
+OCR_CACHE_DIR = CACHE_ROOT / "ocr"
+OCR_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Rendered pages waiting for a worker, per worker; bounds how many page payloads sit in memory
+PAGES_AHEAD_PER_WORKER = 2
+# Pages per shard process; each shard runs in a fresh process, so RSS stays flat however long the PDF
+SHARD_PAGES = 50
 
-def clean_content(text):
-    # Remove excessive dashes (more than 10 in a row) which represent a loop or error
-    text = re.sub(r'-{10,}', '---', text)
-    return text
-
-def extract_page_with_retry(client, page_data, page_num):
-    prompt = f"""
+OCR_PROMPT = """
     Perform high-precision OCR and extraction for PAGE {page_num} of this academic document.
     1. LANGUAGE: Hebrew (RTL).
     2. MATH: LaTeX ($...$) for formulas.
     3. TABLES: Reconstruct in simple Markdown. Do NOT use decorative dividers or excessive symbols.
     4. OUTPUT: Return only the core content.
     """
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=[
-                    types.Part.from_bytes(data=page_data, mime_type="application/pdf"),
-                    prompt
-                ],
-                config=types.GenerateContentConfig(
-                    temperature=0.0,
-                    max_output_tokens=4096,
-                )
+
+def clean_content(text):
+    # Remove excessive dashes (more than 10 in a row) which represent a loop or error
+    text = re.sub(r'-{10,}', '---', text)
+    return text
+
+def extract_page_with_retry(pool, page_data, page_num, cache=None, refresh=False, tags=None, slimmer=None):
+    prompt = OCR_PROMPT.format(page_num=page_num)
+
+    # Keyed on the prompt template rather than the formatted prompt, so the same
+    # slide repeated at a different position (or in another deck) is a hit too
+    key = cache_key(page_data, MODEL_NAME, OCR_PROMPT)
+    if cache is not None and not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"  💾 Page {page_num} served from cache")
+            return cached["text"]
+
+    # Slimmed only on a cache miss; the cache stays keyed on the page as rendered
+    upload_data = slimmer.slim(page_data) if slimmer is not None else page_data
+    tags = {**(tags or {}), "page": page_num, "request_bytes": len(upload_data) + len(prompt.encode("utf-8"))}
+    if slimmer is not None:
+        tags["bytes_saved"] = len(page_data) - len(upload_data)
+        print(f"  🪶 Page {page_num}: {len(page_data) // 1024} KB → {len(upload_data) // 1024} KB")
+
+    def request(client):
+        return client.models.generate_content(
+            model=MODEL_NAME,
+            contents=[
+                types.Part.from_bytes(data=upload_data, mime_type="application/pdf"),
+                prompt
+            ],
+            config=types.GenerateContentConfig(
+                temperature=0.0,
+                max_output_tokens=4096,
             )
-            return clean_content(response.text)
-        except Exception as e:
-            error_msg = str(e).lower()
-            if "429" in error_msg or "quota" in error_msg or "rate" in error_msg:
-                wait_time = (2 ** attempt) * 3
-                print(f"  ⚠️ Rate limit hit on page {page_num}, waiting {wait_time}s...")
-            else:
-                wait_time = (2 ** attempt) + 1
-                print(f"  [Attempt {attempt+1}] Error on Page {page_num}: {e}")
-                
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(wait_time)
-            else:
-                print(f"  ❌ Page {page_num} failed after {MAX_RETRIES} attempts")
-                return None
+        )
+
+    try:
+        response = pool.call(
+            request, PAGE_TOKEN_ESTIMATE, f"page {page_num}", max_retries=MAX_RETRIES, tags=tags
+        )
+    except Exception:
+        print(f"  ❌ Page {page_num} failed after {MAX_RETRIES} attempts")
+        return None
+
+    content = clean_content(response.text)
+    if cache is not None and content:
+        cache.set(key, {"text": content})
+    return content
+
+def render_page(reader, index):
+    # Each page is sent to Gemini as its own single-page PDF
+    writer = PdfWriter()
+    writer.add_page(reader.pages[index])
+    page_buffer = io.BytesIO()
+    writer.write(page_buffer)
+    return page_buffer.getvalue()
+
+def iter_page_payloads(reader, page_nums):
+    # Rendered lazily, so only the pages currently queued or in flight are held in memory
+    for page_num in page_nums:
+        yield page_num, render_page(reader, page_num - 1)
+
+def parse_page_ranges(spec, total_pages):
+    """
+    "1-40,45,50-" -> sorted 1-based page numbers, clipped to the document.
+
+    An open end ("50-") runs to the last page. Raises ValueError on anything
+    that is not a page number or range.
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)(?:-(\d*))?", part)
+        if not match:
+            raise ValueError(f"Bad page range '{part}' (expected e.g. 1-40,45,50-)")
+        start = int(match.group(1))
+        end = start if match.group(2) is None else int(match.group(2) or max(start, total_pages))
+        if start < 1 or end < start:
+            raise ValueError(f"Bad page range '{part}'")
+        pages.update(range(start, min(end, total_pages) + 1))
+    return sorted(pages)
+
+def topic_output_file(course, topic):
+    output_dir = PROJECT_ROOT / "input-materials" / course / "extracted"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir / f"topic-{topic}-extracted.md"
+
+def open_cache(no_cache=False):
+    return None if no_cache else DiskCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES)
+
+def ocr_jobs(jobs, extraction, pool, workers, cache, refresh, tags, slimmer=None):
+    """
+    OCR every job's pending pages on a bounded thread pool, storing each page as it lands.
+
+    PdfReader is not thread-safe, so pages are rendered on this thread and
+    only the network round trips run on the pool. At most
+    PAGES_AHEAD_PER_WORKER pages per worker are rendered ahead of the
+    results, so memory does not grow with the page count.
+    """
+    total_pending = sum(len(job["pending"]) for job in jobs)
+    producer = (
+        (job, page_num, page_data)
+        for job in jobs
+        for page_num, page_data in iter_page_payloads(job["reader"], job["pending"])
+    )
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    interrupted = False
+
+    def submit_next():
+        item = next(producer, None)
+        if item is not None:
+            job, page_num, page_data = item
+            page_tags = {**tags, "source": Path(job["pdf"]).name}
+            futures[executor.submit(extract_page_with_retry, pool, page_data, page_num, cache, refresh, page_tags, slimmer)] = (job, page_num)
+
+    try:
+        for _ in range(workers * PAGES_AHEAD_PER_WORKER):
+            submit_next()
+        done = 0
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, page_num = futures.pop(future)
+                done += 1
+                percent = int((done / total_pending) * 100)
+                content = future.result()
+                extraction.record_page(job["source"], page_num, content)
+
+                if content:
+                    print(f"  ✅ Page {page_num} extracted successfully ({done}/{total_pending}, {percent}%)")
+                submit_next()
+    except KeyboardInterrupt:
+        interrupted = True
+        raise
+    finally:
+        executor.shutdown(wait=not interrupted, cancel_futures=True)
+
+def ocr_shard(shard):
+    """
+    Worker-process entry point: OCR one page range of one PDF straight into the extraction store.
+
+    Opens its own PdfReader, KeyPool (with its share of the quota), cache and
+    store connection, so nothing but this small dict crosses the process boundary.
+    """
+    pool = KeyPool(**shard["pool"])
+    reader = PdfReader(shard["pdf"])
+    job = {"pdf": shard["pdf"], "source": shard["source"], "reader": reader,
+           "total_pages": shard["total_pages"], "pending": shard["pages"]}
+    extraction = ExtractionStore(Path(shard["store"])).topic(shard["tags"]["topic"])
+    slimmer = PageSlimmer(open_slim_cache(not shard["cache"])) if shard["slim"] else None
+    print(f"  🧩 Shard {shard['index']}: pages {shard['pages'][0]}-{shard['pages'][-1]} of {Path(shard['pdf']).name}")
+    ocr_jobs([job], extraction, pool, shard["workers"], open_cache(not shard["cache"]), shard["refresh"],
+             {**shard["tags"], "shard": shard["index"]}, slimmer)
+    if slimmer is not None:
+        print(f"  {slimmer.summary()} in shard {shard['index']}")
+    return shard["index"]
+
+def ocr_sharded(jobs, extraction, pool, shards, workers, cache, refresh, tags, slim=False):
+    # Contiguous SHARD_PAGES ranges per PDF; `shards` processes at a time, each used for one shard only
+    specs = []
+    for job in jobs:
+        pending = job["pending"]
+        for start in range(0, len(pending), SHARD_PAGES):
+            index = len(specs) + 1
+            specs.append({
+                "index": index, "pdf": job["pdf"], "source": job["source"], "total_pages": job["total_pages"],
+                "pages": pending[start:start + SHARD_PAGES], "store": str(extraction.store.path),
+                "workers": workers, "cache": cache is not None, "refresh": refresh, "tags": tags, "slim": slim,
+            })
+    if not specs:
+        return
+    processes = min(shards, len(specs))
+    print(f"🧩 Splitting {sum(len(spec['pages']) for spec in specs)} page(s) into {len(specs)} shard(s) across {processes} process(es)")
+
+    # The caller's pool keeps serving other stages and topics, so the shards' quota is lent out of it, not copied
+    context = multiprocessing.get_context("spawn")
+    with pool.lend(processes) as share, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=context, max_tasks_per_child=1) as executor:
+        for spec in specs:
+            spec["pool"] = share
+        futures = [executor.submit(ocr_shard, spec) for spec in specs]
+        try:
+            for future in as_completed(futures):
+                print(f"  🧩 Shard {future.result()} done")
+        except KeyboardInterrupt:
+            # Shards already running stop on the same Ctrl-C; the pages they stored are kept
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+def record_reused_pages(extraction, job):
+    # Repeated slides get their twin's text; build steps point at the slide that completes them
+    texts = extraction.page_texts(job["source"])
+    for page_num, (representative, exact) in sorted(job["reused"].items()):
+        text = texts.get(representative)
+        if text and not exact:
+            text = f">[PAGE {page_num} IS A BUILD STEP OF PAGE {representative}, ITS CONTENT IS THERE]\n"
+        extraction.record_page(job["source"], page_num, text)
+
+def extract_pdfs(pdf_paths, course, topic, pool, workers=1, cache=None, refresh=False, resume=False, text_layer=False,
+                 pages=None, shards=1, slim=False, dedupe=False, retire_missing=False):
+    """
+    OCR one or more PDFs into the course's extraction store and rebuild the topic markdown.
+
+    Pages from every PDF share one bounded thread pool and the caller's
+    KeyPool, so a topic's decks, exercises and exams are all in flight at
+    once. With text_layer, pages whose embedded text passes the checks in
+    text_layer.py are taken from the PDF directly instead of being sent out.
+    pages ("1-40,45") limits every PDF to those pages. With shards > 1 the
+    pages are split into SHARD_PAGES ranges OCR'd by that many worker
+    processes, each writing straight into the store.
+    With slim, pages that miss the cache are shrunk by page_slimmer.py
+    before upload. With dedupe, repeated slides and incremental build steps
+    found by near_duplicates.py are not sent; they reuse the OCR of the
+    page that contains them. With retire_missing, pdf_paths is the topic's
+    complete file set and stored sources not among them are deleted.
+    Returns one summary dict per PDF, in input order. On Ctrl-C the
+    markdown is still rebuilt from the stored pages before re-raising.
+    """
+    output_file = topic_output_file(course, topic)
+    extraction = ExtractionStore(output_file.with_name(STORE_NAME)).topic(topic)
+    extraction.adopt_legacy_markdown(output_file)
+
+    jobs = []
+    for pdf_path in pdf_paths:
+        pdf_path = str(pdf_path)
+        reader = PdfReader(pdf_path)
+        # Keyed by content, so a moved or renamed PDF keeps its pages; pages split out of
+        # pre-store markdown under the file's name move over
+        source = f"sha256:{file_sha256(pdf_path)}"
+        extraction.claim_source(source, f"legacy:{Path(pdf_path).name}")
+        total_pages = len(reader.pages)
+        selected = parse_page_ranges(pages, total_pages) if pages else list(range(1, total_pages + 1))
+        # Registering up front pins the section order in the markdown to the input order
+        extraction.register_source(source, pdf_path, total_pages)
+        done_pages = extraction.completed_pages(source) if resume else set()
+        pending = [p for p in selected if p not in done_pages]
+        print(f"--- {Path(pdf_path).name}: {total_pages} pages, {len(pending)} to OCR ---")
+        job = {"pdf": pdf_path, "source": source, "reader": reader, "total_pages": total_pages, "selected": selected,
+               "pending": pending, "text_layer_pages": 0, "reused": {}}
+
+        if text_layer:
+            for page_num in list(pending):
+                content = text_layer_content(reader.pages[page_num - 1])
+                if content:
+                    extraction.record_page(source, page_num, content)
+                    pending.remove(page_num)
+                    job["text_layer_pages"] += 1
+            print(f"  📝 Text layer covered {job['text_layer_pages']} page(s), {len(pending)} left for Gemini")
+        if dedupe and pending:
+            pending_set = set(pending)
+            job["reused"] = {p: match for p, match in near_duplicate_pages(reader, selected).items() if p in pending_set}
+            pending[:] = [p for p in pending if p not in job["reused"]]
+            exact = sum(1 for _, is_exact in job["reused"].values() if is_exact)
+            print(f"  🪞 {len(job['reused'])} near-duplicate page(s) ({exact} repeated, {len(job['reused']) - exact} build steps): "
+                  f"{len(job['reused'])} call(s) avoided, {len(pending)} left for Gemini")
+        jobs.append(job)
+
+    if retire_missing:
+        # Sources dropped from the topic or replaced since the last full run go
+        for entry in extraction.keep_sources([job["source"] for job in jobs]):
+            print(f"🗑️ Retired {source_name(entry['display'])}: no longer one of topic {topic}'s PDFs")
+
+    workers = max(1, workers)
+    if workers > 1:
+        print(f"⚡ OCR-ing up to {workers} pages concurrently{' per shard' if shards > 1 else ''}")
+
+    # Every finished page goes straight into the store; the markdown is rebuilt from it in page order below
+    tags = {"stage": "ocr", "course": course, "topic": topic}
+    slimmer = PageSlimmer(open_slim_cache(cache is None)) if slim and shards <= 1 else None
+    try:
+        if shards > 1:
+            ocr_sharded(jobs, extraction, pool, shards, workers, cache, refresh, tags, slim)
+        else:
+            ocr_jobs(jobs, extraction, pool, workers, cache, refresh, tags, slimmer)
+            if slimmer is not None and slimmer.pages:
+                print(slimmer.summary())
+        for job in jobs:
+            record_reused_pages(extraction, job)
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted, keeping stored pages (rerun with --resume to continue)")
+        raise
+    finally:
+        print(f"💾 Writing output to {output_file}...")
+        extraction.write_markdown(output_file, course)
+
+    summaries = []
+    for job in jobs:
+        completed = extraction.completed_pages(job["source"])
+        summaries.append({
+            "pdf": job["pdf"],
+            "total_pages": len(job["selected"]),
+            "success_count": len(completed & set(job["selected"])),
+            "failed_pages": [p for p in job["selected"] if p not in completed],
+            "text_layer_pages": job["text_layer_pages"],
+            "reused_pages": len(job["reused"]),
+        })
+    return summaries
+
+def too_many_failures(summary):
+    return len(summary["failed_pages"]) / max(1, summary["total_pages"]) > 0.2
 
 def run_pipeline():
     parser = argparse.ArgumentParser(description="Extract math curriculum PDFs using Gemini Precision OCR")
     parser.add_argument("--pdf", required=True, help="Path to the input PDF file")
     parser.add_argument("--course", required=True, choices=['math', 'micro', 'acct', 'orgbh'], help="Course name")
     parser.add_argument("--topic", required=True, help="Topic number (e.g., 03)")
-    parser.add_argument("--key", help="Optional override for API key")
+    parser.add_argument("--key", help="Optional override for API key (default: every GEMINI_API_KEY* in .env)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of pages to OCR concurrently (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the local page cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached pages and overwrite them with fresh results")
+    parser.add_argument("--resume", action="store_true", help="Only OCR pages that are missing or failed in the extraction store")
+    parser.add_argument("--text-layer", action="store_true", help="Use the PDF's own text for plain-prose pages instead of calling Gemini")
+    parser.add_argument("--slim", action="store_true", help="Strip unused resources and downsample big images before upload")
+    parser.add_argument("--dedupe", action="store_true", help="Skip repeated slides and build steps, reusing the OCR of the page that contains them")
+    parser.add_argument("--pages", help="Only OCR these pages, e.g. 1-40,45,50- (default: all)")
+    parser.add_argument("--shards", type=int, default=1, help=f"Worker processes for big PDFs, each OCR-ing {SHARD_PAGES}-page ranges (default: 1)")
     
     args = parser.parse_args()
     
-    api_key = args.key or os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    pool = KeyPool.from_keys(args.key) if args.key else KeyPool.from_env() if env_api_keys() else None
+    if pool is None:
         print("❌ ERROR: Gemini API key not found. Set GEMINI_API_KEY in .env or pass --key.")
         sys.exit(1)
+    print(f"🔑 Using {len(pool.keys)} API key(s)")
         
     pdf_path = args.pdf
     if not os.path.exists(pdf_path):
         print(f"❌ ERROR: PDF file not found at {pdf_path}")
         sys.exit(1)
-        
-    output_dir = PROJECT_ROOT / "input-materials" / args.course / "extracted"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / f"topic-{args.topic}-extracted.md"
-
-    client = genai.Client(api_key=api_key)
-    reader = PdfReader(pdf_path)
-    total_pages = len(reader.pages)
-    print(f"--- Starting Cleaned Pipeline for {total_pages} pages ---")
-
-    results = {}
-    failed_pages = []
-    success_count = 0
-
-    for i in range(total_pages):
-        page_num = i + 1
-        percent = int((page_num / total_pages) * 100)
-        print(f"📄 Processing page {page_num}/{total_pages} ({percent}%)...")
-        writer = PdfWriter()
-        writer.add_page(reader.pages[i])
-        page_buffer = io.BytesIO()
-        writer.write(page_buffer)
-        
-        content = extract_page_with_retry(client, page_buffer.getvalue(), page_num)
-        
-        if content:
-            results[page_num] = content
-            success_count += 1
-            print(f"  ✅ Page {page_num} extracted successfully")
-        else:
-            failed_pages.append(page_num)
+    if args.pages:
+        try:
+            parse_page_ranges(args.pages, 1)
+        except ValueError as e:
+            print(f"❌ ERROR: {e}")
+            sys.exit(1)
 
-    print(f"💾 Writing output to {output_file}...")
-    file_exists = output_file.exists()
-    with open(output_file, "a" if file_exists else "w", encoding="utf-8") as f:
-        if not file_exists:
-            f.write(f"# Extracted Content: {args.course} Topic {args.topic}\n\n")
-        else:
-            f.write(f"\n\n---\n## Additional Source: {Path(pdf_path).name}\n\n")
-        f.write(f"Source: {pdf_path}\nCourse: {args.course} | Topic: {args.topic}\n\n")
-        for p in range(1, total_pages + 1):
-            f.write(f"\n\n--- PAGE {p} ---\n\n")
-            if p in results:
-                f.write(results[p])
-            else:
-                f.write(f"\n>[PAGE {p} EXTRACTION FAILED]\n")
-                
-    print(f"🎉 Done! {success_count}/{total_pages} pages extracted successfully")
+    try:
+        summary = extract_pdfs(
+            [pdf_path], args.course, args.topic, pool,
+            workers=args.workers, cache=open_cache(args.no_cache), refresh=args.refresh, resume=args.resume,
+            text_layer=args.text_layer, pages=args.pages, shards=args.shards, slim=args.slim, dedupe=args.dedupe
+        )[0]
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    total_pages = summary["total_pages"]
+    failed_pages = summary["failed_pages"]
+    print(f"🎉 Done! {summary['success_count']}/{total_pages} pages extracted successfully")
+    if args.text_layer:
+        print(f"📉 Text layer saved {summary['text_layer_pages']} API call(s)")
+    if args.dedupe:
+        print(f"🪞 Near-duplicate detection saved {summary['reused_pages']} API call(s)")
     
     if failed_pages:
         print(f"⚠️ Summary: The following pages failed to extract: {failed_pages}")
-        fail_ratio = len(failed_pages) / total_pages
-        if fail_ratio > 0.2:
+        if too_many_failures(summary):
             print(f"❌ ERROR: More than 20% of pages failed ({len(failed_pages)}/{total_pages}). Exiting with code 1.")
             sys.exit(1)
 
@@ -1,174 +1,177 @@
 import json
+import time
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from google import genai
+from types import SimpleNamespace
+from dotenv import load_dotenv
 from google.genai import types
-from pydantic import BaseModel, Field, ValidationError
-from typing import Optional, List, Literal, Union, Any, Dict
-try:
-    from typing import Annotated
-except ImportError:
-    from typing_extensions import Annotated
+from pydantic import ValidationError
+from key_pool import KeyPool, env_api_keys
+from telemetry import usage_dict
+from disk_cache import CACHE_ROOT, DiskCache, cache_key
+from json_stream import LessonJsonStream
+from lesson_repair import RepairError, repair_lesson_pages
+from response_schema import lesson_response_schema, strip_shape_examples
+from lesson_chunks import estimate_tokens, split_extracted_markdown, reduce_lesson_pages
+from boilerplate import strip_boilerplate
+from chapter_artifacts import describe, emit_chapter_artifacts
+from lesson_schema import LessonBlock, LessonPage, LESSON_ADAPTER, PAGE_ADAPTER, BLOCK_ADAPTER
 
 PROJECT_ROOT = Path(__file__).parent.parent
+MODEL_NAME = "gemini-2.5-flash"
+MAX_RETRIES = 3
+PROMPT_PATH = PROJECT_ROOT / "web" / "src" / "prompts" / "lecturer-agent.md"
+LESSON_CACHE_DIR = CACHE_ROOT / "lessons"
+LESSON_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LESSON_CACHE_TTL = 30 * 24 * 3600
+# Input tokens (system prompt + material) one lesson request may carry; checked before anything is sent
+LESSON_TOKEN_BUDGET = 200_000
 
-class HookBlock(BaseModel):
-    type: Literal["hook"]
-    title: Optional[str] = None
-    opener: str
-    question: Optional[str] = None
-    context: Optional[str] = None
+class TokenBudgetError(Exception):
+    pass
 
-class HeroFormulaBlock(BaseModel):
-    type: Literal["hero-formula"]
-    title: str
-    katexString: str
-    subtitle: Optional[str] = None
-    description: Optional[str] = None
-    streetNarrator: Optional[str] = None
-    variables: Optional[List[Dict[str, Any]]] = None
-
-class TextBlock(BaseModel):
-    type: Literal["text"]
-    title: Optional[str] = None
-    formalText: str
-    streetNarrator: str
-
-class DefinitionBlock(BaseModel):
-    type: Literal["definition"]
-    term: str
-    definition: str
-    variant: Optional[str] = None
-    title: Optional[str] = None
-
-class FormulaBlock(BaseModel):
-    type: Literal["formula", "formula-card"]
-    title: str
-    katexString: str
-    subtitle: Optional[str] = None
-    description: Optional[str] = None
-    streetNarrator: Optional[str] = None
-    variables: Optional[List[Dict[str, Any]]] = None
-
-class ReferenceTableRow(BaseModel):
-    ruleName: str
-    generalForm: str
-    numericExample: str
-    streetExplanation: str
-
-class ReferenceTableBlock(BaseModel):
-    type: Literal["reference-table"]
-    title: str
-    rows: List[ReferenceTableRow]
-
-class AnalogyBlock(BaseModel):
-    type: Literal["analogy"]
-    title: Optional[str] = None
-    content: str
-    icon: Optional[str] = None
-
-class DeepDiveSection(BaseModel):
-    title: str
-    content: str
-
-class DeepDiveBlock(BaseModel):
-    type: Literal["deep-dive"]
-    title: str
-    sections: List[DeepDiveSection]
-
-class AlertBlock(BaseModel):
-    type: Literal["alert", "callout"]
-    variant: Literal["tip", "warning", "prerequisite", "info"]
-    title: Optional[str] = None
-    content: str
+def chapter_output_dir(course: str) -> Path:
+    output_dir = PROJECT_ROOT / "web" / "src" / "data" / "chapters" / course
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
 
-class WorkedExampleBlock(BaseModel):
-    type: Literal["worked-example", "real-world-example", "example"]
-    title: str
-    scenario: str
-    solution: str
+def web_artifacts_dir(course: str) -> Path:
+    return PROJECT_ROOT / "web" / "public" / "chapters" / course
 
-class CommonMistakeBlock(BaseModel):
-    type: Literal["common-mistake"]
-    mistake: str
-    correction: Optional[str] = None
+def open_lesson_cache(no_cache=False):
+    return None if no_cache else DiskCache(LESSON_CACHE_DIR, LESSON_CACHE_MAX_BYTES, ttl_seconds=LESSON_CACHE_TTL)
 
-class GuidedExerciseStep(BaseModel):
-    title: Optional[str] = None
-    action: str
-    result: str
+def is_schema_rejection(error):
+    message = str(error)
+    return ("400" in message or "INVALID_ARGUMENT" in message) and "schema" in message.lower()
 
-class GuidedExerciseBlock(BaseModel):
-    type: Literal["guided-exercise"]
-    source: str
-    difficulty: Optional[int] = None
-    question: str
-    thinkingDirection: Optional[str] = None
-    steps: List[GuidedExerciseStep]
-    finalAnswer: str
+def stream_lesson(client, user_message, config, partial_file: Path):
+    """
+    Stream a lesson and validate it while it arrives.
 
-class ExamTipBlock(BaseModel):
-    type: Literal["exam-tip"]
-    source: Optional[str] = None
-    content: str
+    Every block is checked the moment its object closes and every valid page
+    is appended to partial_file (one JSON page per line), so problems surface
+    mid-stream and finished pages are on disk before the response ends.
+    Returns an object with the full .text and the final usage_metadata.
+    """
+    stream = LessonJsonStream()
+    started = time.monotonic()
+    usage_metadata = None
+    valid_pages = 0
 
-class TopicSummaryBlock(BaseModel):
-    type: Literal["topic-summary"]
-    content: str
+    with open(partial_file, "w", encoding="utf-8") as partial:
+        for chunk in client.models.generate_content_stream(model=MODEL_NAME, contents=user_message, config=config):
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            for kind, page, index, raw in stream.feed(chunk.text or ""):
+                elapsed = time.monotonic() - started
+                if kind == "block":
+                    try:
+                        BLOCK_ADAPTER.validate_json(raw)
+                    except ValidationError as e:
+                        for error in e.errors():
+                            print(f"  ❌ [{elapsed:.1f}s] Page {page + 1}, block {index + 1} {error['loc']}: {error['msg']}")
+                    continue
+                try:
+                    lesson_page = PAGE_ADAPTER.validate_json(raw)
+                except ValidationError:
+                    print(f"  ⚠️ [{elapsed:.1f}s] Page {page + 1} has invalid blocks, not written")
+                    continue
+                partial.write(json.dumps(json.loads(raw), ensure_ascii=False) + "\n")
+                partial.flush()
+                valid_pages += 1
+                if valid_pages == 1:
+                    print(f"  ⏱️ First page ready after {elapsed:.1f}s")
+                print(f"  📄 [{elapsed:.1f}s] Page {page + 1} '{lesson_page.pageTitle}' validated ({len(lesson_page.blocks)} blocks)")
 
-class ImageBlock(BaseModel):
-    type: Literal["image"]
-    src: str
-    alt: str
-    caption: Optional[str] = None
+    return SimpleNamespace(text=stream.full_text(), usage_metadata=usage_metadata)
 
-class StreetSmartBlock(BaseModel):
-    type: Literal["street-smart"]
-    title: Optional[str] = None
-    content: str
-    emoji: Optional[str] = None
-    opener: Optional[str] = None
+def request_lesson_pages(pool: KeyPool, user_message: str, config, label: str, partial_file: Path, stream: bool = False, cache: DiskCache = None, refresh: bool = False, repair: bool = False, tags: dict = None) -> list:
+    def try_api_call(client):
+        if stream:
+            return stream_lesson(client, user_message, config, partial_file)
+        return client.models.generate_content(
+            model=MODEL_NAME,
+            contents=user_message,
+            config=config
+        )
 
-class QuizQuestion(BaseModel):
-    id: str
-    question: str
-    options: List[str]
-    correctIndex: int
-    explanation: Optional[str] = None
+    # The serialized config covers the system instruction, temperature and output settings
+    key = cache_key(MODEL_NAME, config.model_dump_json(exclude_none=True), user_message)
+    cached = cache.get(key) if cache is not None and not refresh else None
+    if cached is not None:
+        try:
+            json.loads(cached["text"])
+        except ValueError:
+            # Entries from before unparseable responses stopped being cached
+            print(f"⚠️ Cached response for {label} is not valid JSON, requesting a new one")
+            cached = None
+    if cached is not None:
+        print(f"💾 {label} served from cache (stored as {'valid' if cached['valid'] else 'invalid'}, {(cached['usage'] or {}).get('total_token_count') or '?'} tokens saved)")
+        response_text = cached["text"]
+    else:
+        estimated_tokens = estimate_tokens(config.system_instruction + user_message)
+        try:
+            request_bytes = len((config.system_instruction + user_message).encode("utf-8"))
+            response = pool.call(try_api_call, estimated_tokens, label, max_retries=MAX_RETRIES,
+                                 tags={**(tags or {}), "request_bytes": request_bytes})
+        except Exception as e:
+            raise Exception(f"API generation failed: {e}")
+        response_text = response.text
 
-class CheckpointQuizBlock(BaseModel):
-    type: Literal["checkpoint", "checkpoint-quiz"]
-    questions: List[QuizQuestion]
+    # Validate JSON shape with Pydantic
+    valid = False
+    parsed = False
+    try:
+        data = json.loads(response_text)
+        parsed = True
+        LESSON_ADAPTER.validate_python(data)
+        valid = True
+        
+        print(f"✅ Pydantic validation passed for {label}! JSON shape is correct.")
+    except ValidationError as e:
+        print(f"❌ Validation errors found in AI output for {label}:")
+        for error in e.errors():
+            print(f"  Location {error['loc']}: {error['msg']}")
+        repaired = None
+        if repair:
+            try:
+                repaired = repair_lesson_pages(pool, data, e, label, MODEL_NAME, cache, {**(tags or {}), "stage": "repair"})
+            except RepairError as repair_error:
+                print(f"❌ Repair failed for {label}: {repair_error}")
+        if repaired is None:
+            if cached is not None:
+                print("  💡 This response came from the cache; pass --refresh to request a new one")
+            # Option A: Raise and stop (Safe, requires manual fix or prompt fix)
+            # We enforce "Raise and stop" to surface the exact LLM hallucinations to the developer.
+            raise Exception("Pydantic Validation Error during generation.") from e
+        data = repaired
+    except Exception as e:
+        if cached is not None:
+            print("  💡 This response came from the cache; pass --refresh to request a new one")
+        first_chars = response_text[:200].replace('\n', '\\n')
+        raise Exception(f"Invalid JSON returned from Gemini: {e}\n--- First 200 chars: {first_chars}")
+    finally:
+        # Off-schema responses are kept too, so validator changes can be retried without a paid call;
+        # truncated or malformed JSON is not, so the next run asks again
+        if cache is not None and cached is None and parsed:
+            cache.set(key, {"text": response_text, "valid": valid, "usage": usage_dict(response.usage_metadata)})
 
-# Need to set an alias generator to allow reading arbitrary types? 
-# We'll rely on correct json formats but fallback on ignoring exact discriminator match if it errors.
-# Actually, Pydantic handles discrimination.
-LessonBlock = Annotated[Union[
-    HookBlock,
-    HeroFormulaBlock,
-    TextBlock,
-    DefinitionBlock,
-    FormulaBlock,
-    ReferenceTableBlock,
-    AnalogyBlock,
-    DeepDiveBlock,
-    AlertBlock,
-    WorkedExampleBlock,
-    CommonMistakeBlock,
-    GuidedExerciseBlock,
-    ExamTipBlock,
-    TopicSummaryBlock,
-    ImageBlock,
-    StreetSmartBlock,
-    CheckpointQuizBlock,
-], Field(discriminator="type")]
+    partial_file.unlink(missing_ok=True)
+    return data
 
-class LessonPage(BaseModel):
-    pageTitle: str
-    blocks: List[LessonBlock]
+def preflight(config, messages, token_budget):
+    # Fail before the first paid call rather than on the request that turns out too large
+    estimates = [estimate_tokens(config.system_instruction + message) for message in messages]
+    print(f"🧮 Preflight: ~{max(estimates):,} input tokens per request, {sum(estimates):,} in total (budget {token_budget:,} per request)")
+    over = [i for i, tokens in enumerate(estimates, start=1) if tokens > token_budget]
+    if over:
+        where = "the request" if len(messages) == 1 else f"part(s) {', '.join(map(str, over))}"
+        raise TokenBudgetError(f"~{max(estimates):,} input tokens in {where}, over the budget of {token_budget:,}; "
+                               "pass a smaller --chunk-tokens or a larger --token-budget")
 
-def generate_lesson(course: str, topic: str, extracted_md_path: Path, api_key: str, api_key_2: str = None) -> Path:
+def generate_lesson(course: str, topic: str, extracted_md_path: Path, api_key: str = None, api_key_2: str = None, pool: KeyPool = None, stream: bool = False, chunk_tokens: int = None, cache: DiskCache = None, refresh: bool = False, repair: bool = False, structured: bool = False, strip: bool = False, token_budget: int = LESSON_TOKEN_BUDGET) -> Path:
     print("📖 Reading extracted content...")
     
     if not extracted_md_path.exists():
@@ -176,73 +179,89 @@ def generate_lesson(course: str, topic: str, extracted_md_path: Path, api_key: s
         sys.exit(1)
         
     extracted_md = extracted_md_path.read_text(encoding="utf-8")
+    if strip:
+        original_tokens = estimate_tokens(extracted_md)
+        extracted_md, stats = strip_boilerplate(extracted_md)
+        stripped_tokens = estimate_tokens(extracted_md)
+        saved = 1 - stripped_tokens / original_tokens if original_tokens else 0
+        print(f"🧹 Topic {topic}: stripped {stats['lines']} template line(s) ({stats['templates']} distinct) and "
+              f"{stats['collapsed']} build slide(s), ~{original_tokens:,} → {stripped_tokens:,} tokens (-{saved:.0%})")
     
-    prompt_path = PROJECT_ROOT / "web" / "src" / "prompts" / "lecturer-agent.md"
+    prompt_path = PROMPT_PATH
     if not prompt_path.exists():
         print(f"❌ ERROR: System prompt not found: {prompt_path}")
         sys.exit(1)
         
     system_instruction = prompt_path.read_text(encoding="utf-8")
-    user_message = f"{extracted_md}\n\nGenerate a complete lesson for topic {topic}. Output only a valid JSON array of ConceptBlocks as specified in your instructions."
-    
-    print("🤖 Calling Gemini API...")
     
-    def try_api_call(key):
-        client = genai.Client(api_key=key)
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=user_message,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.2, # Low temperature for more deterministic outputs
-                response_mime_type="application/json", 
-            )
-        )
-        return response.text
-        
-    try:
-        response_text = try_api_call(api_key)
-    except Exception as e:
-        error_msg = str(e).lower()
-        if ("429" in error_msg or "quota" in error_msg or "rate" in error_msg) and api_key_2:
-            print("⚠️ Primary key rate limited, switching to fallback key...")
-            try:
-                response_text = try_api_call(api_key_2)
-            except Exception as e2:
-                raise Exception(f"API generation failed on fallback key: {e2}")
-        else:
-            raise Exception(f"API generation failed: {e}")
-            
-    # Validate JSON shape with Pydantic
-    try:
-        data = json.loads(response_text)
+    if pool is None:
+        pool = KeyPool.from_keys(api_key, api_key_2)
+
+    config = types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        temperature=0.2, # Low temperature for more deterministic outputs
+        response_mime_type="application/json", 
+    )
+    prose_config = config
+    if structured:
+        # Constrain decoding to the lesson schema; the prose copy of the shapes can go
+        schema, narrowed = lesson_response_schema()
+        short_instruction = strip_shape_examples(system_instruction)
+        config = config.model_copy(update={"system_instruction": short_instruction, "response_json_schema": schema})
+        saved = 1 - len(short_instruction) / len(system_instruction)
+        print(f"📐 Structured output on: system prompt {len(system_instruction)} → {len(short_instruction)} chars (-{saved:.0%})")
+        if narrowed:
+            print(f"   Narrowed to strings (not expressible in the schema dialect): {', '.join(narrowed)}")
+
+    def request(user_message, label, partial_file, chunk=None):
+        tags = {"stage": "lesson", "course": course, "topic": topic, "chunk": chunk}
         try:
-            from pydantic import TypeAdapter
-            adapter = TypeAdapter(List[LessonPage])
-            adapter.validate_python(data)
-        except ImportError:
-            from pydantic import parse_obj_as
-            parse_obj_as(List[LessonPage], data)
-        
-        print("✅ Pydantic validation passed! JSON shape is correct.")
-    except ValidationError as e:
-        print("❌ Validation errors found in AI output:")
-        for error in e.errors():
-            print(f"  Location {error['loc']}: {error['msg']}")
-        # Option A: Raise and stop (Safe, requires manual fix or prompt fix)
-        # We enforce "Raise and stop" to surface the exact LLM hallucinations to the developer.
-        raise Exception("Pydantic Validation Error during generation.") from e
-    except Exception as e:
-        first_chars = response_text[:200].replace('\n', '\\n')
-        raise Exception(f"Invalid JSON returned from Gemini: {e}\n--- First 200 chars: {first_chars}")
+            return request_lesson_pages(pool, user_message, config, label, partial_file, stream, cache, refresh, repair, tags)
+        except Exception as e:
+            if config is prose_config or not is_schema_rejection(e):
+                raise
+            print(f"⚠️ Gemini rejected the response schema for {label}, falling back to the prose-only prompt: {e}")
+            return request_lesson_pages(pool, user_message, prose_config, label, partial_file, stream, cache, refresh, repair, tags)
+
+    output_dir = chapter_output_dir(course)
+
+    chunks = [extracted_md]
+    if chunk_tokens and estimate_tokens(extracted_md) > chunk_tokens:
+        chunks = split_extracted_markdown(extracted_md, chunk_tokens)
+
+    if len(chunks) == 1:
+        user_message = f"{extracted_md}\n\nGenerate a complete lesson for topic {topic}. Output only a valid JSON array of ConceptBlocks as specified in your instructions."
+        preflight(config, [user_message], token_budget)
+        print(f"🤖 Calling Gemini API ({len(pool.keys)} key(s) in pool)...")
+        data = request(user_message, f"topic {topic} lesson", output_dir / f"chapter-{topic}.partial.jsonl")
+    else:
+        user_messages = [
+            f"{chunk}\n\nThis is part {i} of {len(chunks)} of the material for topic {topic}. "
+            "Generate lesson pages covering only this part. Output only a valid JSON array of ConceptBlocks as specified in your instructions."
+            for i, chunk in enumerate(chunks, start=1)
+        ]
+        preflight(config, user_messages, token_budget)
+        # Map: every chunk becomes its own short lesson, all in flight at once and
+        # throttled by the key pool. Reduce: stitch them back together in order.
+        print(f"🤖 Calling Gemini API for {len(chunks)} chunks of ≤{chunk_tokens} tokens ({len(pool.keys)} key(s) in pool)...")
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            futures = []
+            for i, user_message in enumerate(user_messages, start=1):
+                futures.append(executor.submit(
+                    request, user_message, f"topic {topic} part {i}/{len(chunks)}",
+                    output_dir / f"chapter-{topic}.part-{i:02d}.partial.jsonl", i
+                ))
+            chunk_pages = [future.result() for future in futures]
+        data = reduce_lesson_pages(chunk_pages)
+        print(f"🧩 Merged {sum(len(pages) for pages in chunk_pages)} chunk pages into {len(data)} lesson pages")
+        LESSON_ADAPTER.validate_python(data)
 
     print(f"💾 Writing chapter-{topic}.json...")
     
-    output_dir = PROJECT_ROOT / "web" / "src" / "data" / "chapters" / course
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
     output_file = output_dir / f"chapter-{topic}.json"
     output_file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    manifest = emit_chapter_artifacts(output_file, web_artifacts_dir(course), force=True)
+    print(f"📦 Web artifacts: {describe(manifest)}")
     
     return output_file
 
@@ -251,17 +270,41 @@ if __name__ == "__main__":
     parser.add_argument("--course", required=True, choices=['math', 'micro', 'acct', 'orgbh'], help="Course name")
     parser.add_argument("--topic", required=True, help="Topic number (e.g., 03)")
     parser.add_argument("--extracted", required=True, help="Path to extracted markdown file")
-    parser.add_argument("--key", required=True, help="Gemini API Key")
-    parser.add_argument("--key2", help="Optional fallback Gemini API Key")
+    parser.add_argument("--key", help="Gemini API Key (default: every GEMINI_API_KEY* in .env)")
+    parser.add_argument("--key2", help="Optional extra Gemini API Key")
+    parser.add_argument("--stream", action="store_true", help="Stream the response and validate pages as they arrive")
+    parser.add_argument("--chunk-tokens", type=int, help="Split topics larger than this many tokens and generate the parts in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the local response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses and overwrite them with fresh results")
+    parser.add_argument("--repair", action="store_true", help="Fix invalid blocks with small follow-up calls instead of failing the lesson")
+    parser.add_argument("--structured", action="store_true", help="Constrain the response to the lesson JSON schema")
+    parser.add_argument("--strip-boilerplate", action="store_true", help="Drop repeated slide headers/footers and build-up slides before the call")
+    parser.add_argument("--token-budget", type=int, default=LESSON_TOKEN_BUDGET, help=f"Refuse requests estimated above this many input tokens (default: {LESSON_TOKEN_BUDGET})")
     
     args = parser.parse_args()
+
+    if args.key:
+        pool = KeyPool.from_keys(args.key, args.key2)
+    else:
+        load_dotenv(PROJECT_ROOT / ".env", override=True)
+        if not env_api_keys():
+            print("❌ ERROR: Gemini API key required. Set GEMINI_API_KEY in .env or pass --key.")
+            sys.exit(1)
+        pool = KeyPool.from_env()
     
     output_path = generate_lesson(
         course=args.course, 
         topic=args.topic, 
         extracted_md_path=Path(args.extracted), 
-        api_key=args.key, 
-        api_key_2=args.key2
+        pool=pool,
+        stream=args.stream,
+        chunk_tokens=args.chunk_tokens,
+        cache=open_lesson_cache(args.no_cache),
+        refresh=args.refresh,
+        repair=args.repair,
+        structured=args.structured,
+        strip=args.strip_boilerplate,
+        token_budget=args.token_budget
     )
     
     print(f"🎉 Successfully generated: {output_path}")
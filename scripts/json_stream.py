@@ -0,0 +1,73 @@
+class LessonJsonStream:
+    """
+    Incremental scanner for the streamed List[LessonPage] JSON array.
+
+    Feed it response chunks as they arrive; it yields ("block", page, index,
+    raw) as soon as a block object inside a page's "blocks" array closes, and
+    ("page", page, None, raw) when a whole page object closes. Raw values are
+    the exact JSON substrings, so callers can json.loads and validate them
+    without waiting for the rest of the response. Only the structure is
+    tracked here (strings, escapes, nesting), not full JSON grammar, so the
+    final json.loads of the whole text is still the source of truth.
+    """
+
+    def __init__(self):
+        self.text = []
+        self._buffer = ""
+        self._offset = 0        # absolute position of _buffer[0]
+        self._pos = 0           # absolute position of the next unscanned char
+        self._stack = []        # open containers: (char, absolute start)
+        self._in_string = False
+        self._escaped = False
+        self._page_index = -1
+        self._block_index = -1
+
+    def feed(self, chunk):
+        self.text.append(chunk)
+        self._buffer += chunk
+        events = []
+        end = self._offset + len(self._buffer)
+        while self._pos < end:
+            ch = self._buffer[self._pos - self._offset]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                depth = len(self._stack)
+                if ch == "{" and depth == 1:
+                    self._page_index += 1
+                    self._block_index = -1
+                elif ch == "{" and depth == 3 and self._stack[1][0] == "{" and self._stack[2][0] == "[":
+                    self._block_index += 1
+                self._stack.append((ch, self._pos))
+            elif ch in "]}":
+                if not self._stack:
+                    raise ValueError(f"Unbalanced '{ch}' at offset {self._pos}")
+                opener, start = self._stack.pop()
+                depth = len(self._stack)
+                if ch == "}" and depth == 1:
+                    events.append(("page", self._page_index, None, self._slice(start, self._pos + 1)))
+                elif ch == "}" and depth == 3 and self._stack[1][0] == "{" and self._stack[2][0] == "[":
+                    events.append(("block", self._page_index, self._block_index, self._slice(start, self._pos + 1)))
+            self._pos += 1
+        self._trim()
+        return events
+
+    def _slice(self, start, stop):
+        return self._buffer[start - self._offset:stop - self._offset]
+
+    def _trim(self):
+        # Drop scanned text that no open page can still refer to, so slicing stays cheap
+        keep_from = self._stack[1][1] if len(self._stack) > 1 else self._pos
+        if keep_from > self._offset:
+            self._buffer = self._buffer[keep_from - self._offset:]
+            self._offset = keep_from
+
+    def full_text(self):
+        return "".join(self.text)
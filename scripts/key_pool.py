@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from google import genai
+from telemetry import record_call
+
+# Per-key free-tier quota for gemini-2.5-flash; override with GEMINI_RPM /
+# GEMINI_TPM in .env for paid tiers (read lazily, after the scripts load .env)
+DEFAULT_RPM = 10
+DEFAULT_TPM = 250000
+# Ceiling for the AIMD concurrency window of a single key (GEMINI_MAX_CONCURRENCY)
+DEFAULT_MAX_CONCURRENCY = 8
+MAX_COOLDOWN_SECONDS = 60
+
+def is_rate_limit_error(e):
+    # genai errors carry the HTTP status; a 400 whose message mentions "GenerateContentRequest" is not a 429
+    code = getattr(e, "code", None)
+    if isinstance(code, int):
+        return code == 429
+    error_msg = str(e).lower()
+    return "429" in error_msg or "resource_exhausted" in error_msg or "quota" in error_msg
+
+def usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage else None
+
+def env_api_keys():
+    # GEMINI_API_KEY first, then GEMINI_API_KEY_2, GEMINI_API_KEY_3, ... in numeric order
+    found = []
+    for name, value in os.environ.items():
+        match = re.fullmatch(r"GEMINI_API_KEY(?:_(\d+))?", name)
+        if match and value:
+            found.append((int(match.group(1) or 1), name, value))
+    found.sort()
+    keys, seen = [], set()
+    for _, name, value in found:
+        if value not in seen:
+            seen.add(value)
+            keys.append((name, value))
+    return keys
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        # Seconds until `amount` can be taken; requests bigger than the bucket only need a full one
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def resize(self, per_minute, now):
+        self._refill(now)
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = min(self.level, self.capacity)
+
+    def take(self, amount, now):
+        self._refill(now)
+        # May go negative when a response used more tokens than estimated; that debt delays the next call
+        self.level -= amount
+
+class ApiKey:
+    def __init__(self, key_id, api_key, rpm, tpm, max_concurrency, client_factory=None):
+        self.key_id = key_id
+        self.api_key = api_key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = min(2.0, float(max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.consecutive_429s = 0
+        self._client = None
+        self._client_factory = client_factory or genai.Client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory(api_key=self.api_key)
+        return self._client
+
+    def wait_time(self, estimated_tokens, now):
+        if self.in_flight >= int(self.limit):
+            return None  # only a release can free this key up
+        return max(
+            self.cooldown_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+
+class Lease:
+    def __init__(self, pool, key, estimated_tokens):
+        self.pool = pool
+        self.key = key
+        self.estimated_tokens = estimated_tokens
+        self.client = key.client
+        self.key_id = key.key_id
+
+class KeyPool:
+    """
+    Schedules Gemini calls across every configured API key.
+
+    Each key has request and token buckets sized to its RPM/TPM quota plus an
+    AIMD concurrency window: every success widens it a little, every 429
+    halves it and puts the key on a growing cooldown. Callers always get the
+    key with the most headroom, so a throttled key never stalls the run while
+    another still has quota. One pool is meant to be shared by every stage;
+    quota lent to shard processes is held back from it until they finish.
+    """
+
+    def __init__(self, api_keys, rpm=None, tpm=None, max_concurrency=None, client_factory=None):
+        if not api_keys:
+            raise ValueError("KeyPool needs at least one API key")
+        rpm = rpm or int(os.getenv("GEMINI_RPM", DEFAULT_RPM))
+        tpm = tpm or int(os.getenv("GEMINI_TPM", DEFAULT_TPM))
+        max_concurrency = max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        # client_factory(api_key=...) stands in for genai.Client, e.g. fake_gemini.FakeClient
+        self.keys = [ApiKey(key_id, api_key, rpm, tpm, max_concurrency, client_factory) for key_id, api_key in api_keys]
+        self._cond = threading.Condition()
+        # Share of every key's quota currently lent to other processes
+        self._lent = 0.0
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(env_api_keys(), **kwargs)
+
+    @classmethod
+    def from_keys(cls, *api_keys, **kwargs):
+        keys = [key for key in api_keys if key]
+        return cls([(f"key-{i + 1}", key) for i, key in enumerate(dict.fromkeys(keys))], **kwargs)
+
+    def _resize(self):
+        now = time.monotonic()
+        for key in self.keys:
+            key.requests.resize(key.rpm * (1 - self._lent), now)
+            key.tokens.resize(key.tpm * (1 - self._lent), now)
+
+    @contextmanager
+    def lend(self, parts):
+        """
+        Yield picklable KeyPool(**kwargs) for each of `parts` processes, holding their quota back from this pool.
+
+        Every process gets an equal share of the quota not already lent, and
+        this pool keeps one more such share for its own callers, so shard
+        processes, the other topics of a batch and the lesson stage together
+        stay within the keys' RPM/TPM. The shares return when the block exits.
+        """
+        with self._cond:
+            share = (1.0 - self._lent) / (parts + 1)
+            self._lent += share * parts
+            self._resize()
+        key = self.keys[0]
+        try:
+            yield {
+                "api_keys": [(k.key_id, k.api_key) for k in self.keys],
+                # Fractional rates are fine for a bucket, and rounding up would overshoot the quota
+                "rpm": key.rpm * share,
+                "tpm": key.tpm * share,
+                "max_concurrency": key.max_concurrency,
+            }
+        finally:
+            with self._cond:
+                self._lent = max(0.0, self._lent - share * parts)
+                self._resize()
+                self._cond.notify_all()
+
+    def acquire(self, estimated_tokens):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                best, best_load, shortest_wait = None, None, None
+                for key in self.keys:
+                    wait = key.wait_time(estimated_tokens, now)
+                    if wait is None:
+                        continue
+                    if wait <= 0:
+                        load = key.in_flight / key.limit
+                        if best is None or load < best_load:
+                            best, best_load = key, load
+                    elif shortest_wait is None or wait < shortest_wait:
+                        shortest_wait = wait
+                if best is not None:
+                    best.in_flight += 1
+                    best.requests.take(1, now)
+                    best.tokens.take(estimated_tokens, now)
+                    return Lease(self, best, estimated_tokens)
+                self._cond.wait(timeout=min(shortest_wait or 1.0, 1.0))
+
+    def release(self, lease, rate_limited=False, errored=False, used_tokens=None):
+        with self._cond:
+            key = lease.key
+            key.in_flight -= 1
+            now = time.monotonic()
+            if errored:
+                # Non-quota failures say nothing about capacity; leave the window alone
+                pass
+            elif rate_limited:
+                key.consecutive_429s += 1
+                key.limit = max(1.0, key.limit / 2)
+                key.cooldown_until = now + min(MAX_COOLDOWN_SECONDS, 3 * 2 ** (key.consecutive_429s - 1))
+            else:
+                key.consecutive_429s = 0
+                key.limit = min(float(key.max_concurrency), key.limit + 1.0 / key.limit)
+                if used_tokens is not None:
+                    key.tokens.take(used_tokens - lease.estimated_tokens, now)
+            self._cond.notify_all()
+
+    def call(self, request, estimated_tokens, label, max_retries=5, tags=None):
+        """
+        Run request(client) on the best available key, retrying on errors.
+
+        Every attempt is recorded to the API metrics log together with tags
+        (stage, course, topic, page, request_bytes, ...).
+        """
+        last_error = None
+        for attempt in range(max_retries):
+            queued = time.monotonic()
+            lease = self.acquire(estimated_tokens)
+            started = time.monotonic()
+            try:
+                response = request(lease.client)
+            except Exception as e:
+                last_error = e
+                rate_limited = is_rate_limit_error(e)
+                record_call(tags, lease.key_id, attempt + 1, started - queued, time.monotonic() - started,
+                            "rate_limited" if rate_limited else "error", error=e)
+                if rate_limited:
+                    self.release(lease, rate_limited=True)
+                    print(f"  ⚠️ Rate limit hit on {label} ({lease.key_id}), rescheduling...")
+                    continue
+                self.release(lease, errored=True)
+                print(f"  [Attempt {attempt+1}] Error on {label}: {e}")
+                if attempt < max_retries - 1:
+                    time.sleep((2 ** attempt) + 1)
+                continue
+            record_call(tags, lease.key_id, attempt + 1, started - queued, time.monotonic() - started, "ok", response=response)
+            self.release(lease, used_tokens=usage_tokens(response))
+            return response
+        raise last_error
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def default_pool():
+    # Process-wide pool over the GEMINI_API_KEY* variables, shared by OCR and generation
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = KeyPool.from_env()
+        return _default_pool
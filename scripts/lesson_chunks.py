@@ -0,0 +1,81 @@
+import re
+
+# ~3 characters per token is a conservative estimate for mixed Hebrew/LaTeX input
+CHARS_PER_TOKEN = 3
+
+PAGE_MARKER_RE = re.compile(r"^--- PAGE \d+ ---$", re.MULTILINE)
+SOURCE_MARKER_RE = re.compile(r"^(?:---\n)?## Additional Source: .*$", re.MULTILINE)
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+def split_units(extracted_md):
+    """Split topic markdown into (starts_source, text) units, one per extracted page."""
+    starts = sorted({0} | {m.start() for m in PAGE_MARKER_RE.finditer(extracted_md)}
+                    | {m.start() for m in SOURCE_MARKER_RE.finditer(extracted_md)})
+    units, header = [], ""
+    for begin, end in zip(starts, starts[1:] + [len(extracted_md)]):
+        text = extracted_md[begin:end]
+        if not PAGE_MARKER_RE.search(text):
+            # File and source headers travel with the first page after them
+            header += text
+            continue
+        units.append((bool(header.strip()), header + text))
+        header = ""
+    if header.strip():
+        units.append((True, header))
+    return units
+
+def split_extracted_markdown(extracted_md, token_budget):
+    """
+    Pack page units into chunks of at most token_budget tokens.
+
+    A new source (lecture deck, exercise sheet, exam) starts a new chunk once
+    the current one is at least half full, so chunks tend to follow source
+    boundaries. A single page larger than the budget becomes its own chunk.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for is_source_start, text in split_units(extracted_md):
+        tokens = estimate_tokens(text)
+        source_break = is_source_start and current_tokens >= token_budget // 2
+        if current and (current_tokens + tokens > token_budget or source_break):
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+def _normalize_term(term):
+    return re.sub(r"\s+", " ", term or "").strip().lower()
+
+def reduce_lesson_pages(chunk_pages):
+    """
+    Merge per-chunk page lists into one lesson, in chunk order.
+
+    Each chunk is generated as if it were a whole lesson, so the seams get
+    cleaned up here: only the first chunk keeps its hook, only the last keeps
+    its topic summary, a definition whose term was already defined is
+    dropped, and pages left without blocks are removed.
+    """
+    merged, seen_terms = [], set()
+    last = len(chunk_pages) - 1
+    for chunk_index, pages in enumerate(chunk_pages):
+        for page in pages:
+            blocks = []
+            for block in page["blocks"]:
+                block_type = block.get("type")
+                if block_type == "hook" and chunk_index > 0:
+                    continue
+                if block_type == "topic-summary" and chunk_index < last:
+                    continue
+                if block_type == "definition":
+                    term = _normalize_term(block.get("term"))
+                    if term in seen_terms:
+                        continue
+                    seen_terms.add(term)
+                blocks.append(block)
+            if blocks:
+                merged.append({**page, "blocks": blocks})
+    return merged
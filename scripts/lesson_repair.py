@@ -0,0 +1,141 @@
+import json
+import threading
+from typing import get_args
+from concurrent.futures import ThreadPoolExecutor
+from google.genai import types
+from pydantic import ValidationError
+from disk_cache import cache_key
+from lesson_chunks import estimate_tokens
+from lesson_schema import BLOCK_MODELS, LESSON_ADAPTER, BLOCK_ADAPTER, block_model_for
+from validate_chapters import format_loc
+
+# Per failing block, and for the whole lesson
+REPAIR_ATTEMPTS = 2
+REPAIR_BUDGET = 24
+REPAIR_WORKERS = 8
+
+REPAIR_INSTRUCTION = """You fix single JSON blocks of a Hebrew lesson so that they match a schema.
+Return only the corrected JSON object, nothing else.
+Keep the existing wording, language, LaTeX and meaning. Change only what the errors require:
+add missing fields from the block's own content, rename or restructure fields, or switch an
+unknown "type" to the closest allowed type and map its fields onto that type."""
+
+class RepairError(Exception):
+    pass
+
+def group_block_errors(errors):
+    """
+    Map (page, block) -> [(loc, msg)] for errors inside a block.
+
+    Returns None if any error is outside a block (bad page title, blocks not
+    a list, ...), since those cannot be fixed one block at a time.
+    """
+    grouped = {}
+    for error in errors:
+        loc = error["loc"]
+        if len(loc) < 3 or loc[1] != "blocks" or not isinstance(loc[2], int):
+            return None
+        # Drop the page/block prefix and the union tag so the model sees field paths
+        inner = loc[3:]
+        if inner and isinstance(inner[0], str) and block_model_for(inner[0]) is not None:
+            inner = inner[1:]
+        grouped.setdefault((loc[0], loc[2]), []).append((format_loc(inner) or "(block)", error["msg"]))
+    return grouped
+
+def schema_excerpt(block):
+    # The failing block's own model, or a one-line-per-type overview if its type is unknown
+    block_type = block.get("type") if isinstance(block, dict) else None
+    model = block_model_for(block_type)
+    if model is not None:
+        return json.dumps(model.model_json_schema(), ensure_ascii=False)
+    lines = []
+    for model in BLOCK_MODELS:
+        fields = [name if field.is_required() else f"{name}?" for name, field in model.model_fields.items() if name != "type"]
+        type_names = " | ".join(get_args(model.model_fields["type"].annotation))
+        lines.append(f"{type_names}: {', '.join(fields)}")
+    return "\n".join(lines)
+
+def repair_message(block, errors):
+    error_lines = "\n".join(f"- {loc}: {msg}" for loc, msg in errors)
+    return (
+        f"Block:\n{json.dumps(block, ensure_ascii=False)}\n\n"
+        f"Validation errors:\n{error_lines}\n\n"
+        f"Schema:\n{schema_excerpt(block)}"
+    )
+
+def repair_lesson_pages(pool, data, validation_error, label, model_name, cache=None, tags=None):
+    """
+    Fix only the blocks named in validation_error and splice them back into data.
+
+    Each failing block goes to the model on its own with its errors and schema,
+    in parallel, with up to REPAIR_ATTEMPTS tries per block and REPAIR_BUDGET
+    calls overall. Valid pages and blocks are never sent. Raises RepairError if
+    the errors are not block-level or a block is still invalid at the end.
+    """
+    grouped = group_block_errors(validation_error.errors())
+    if grouped is None:
+        raise RepairError("errors outside individual blocks, cannot repair")
+
+    config = types.GenerateContentConfig(
+        system_instruction=REPAIR_INSTRUCTION,
+        temperature=0.2,
+        response_mime_type="application/json",
+    )
+    budget = {"calls": REPAIR_BUDGET}
+    budget_lock = threading.Lock()
+
+    def repair_block(target):
+        page, index = target
+        block, errors = data[page]["blocks"][index], grouped[target]
+        for attempt in range(REPAIR_ATTEMPTS):
+            message = repair_message(block, errors)
+            key = cache_key(model_name, config.model_dump_json(exclude_none=True), message)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                response_text = cached["text"]
+            else:
+                with budget_lock:
+                    if budget["calls"] == 0:
+                        return None
+                    budget["calls"] -= 1
+                request = lambda client: client.models.generate_content(model=model_name, contents=message, config=config)
+                try:
+                    response_text = pool.call(
+                        request, estimate_tokens(REPAIR_INSTRUCTION + message), f"{label} repair p{page + 1}b{index + 1}",
+                        tags={**(tags or {}), "page": page + 1, "block": index + 1,
+                              "request_bytes": len((REPAIR_INSTRUCTION + message).encode("utf-8"))}
+                    ).text
+                except Exception as e:
+                    print(f"  ⚠️ Repair call for page {page + 1}, block {index + 1} failed: {e}")
+                    return None
+                if cache is not None:
+                    cache.set(key, {"text": response_text})
+            try:
+                block = json.loads(response_text)
+                BLOCK_ADAPTER.validate_python(block)
+                return block
+            except ValidationError as e:
+                errors = [(format_loc(error["loc"][1:]) or "(block)", error["msg"]) for error in e.errors()]
+            except ValueError as e:
+                errors = [("(block)", f"not valid JSON: {e}")]
+        return None
+
+    targets = sorted(grouped)
+    print(f"🔧 Repairing {len(targets)} invalid block(s) for {label}, keeping the rest...")
+    with ThreadPoolExecutor(max_workers=min(REPAIR_WORKERS, len(targets))) as executor:
+        results = list(executor.map(repair_block, targets))
+
+    failed = [target for target, block in zip(targets, results) if block is None]
+    if failed:
+        where = ", ".join(f"page {page + 1} block {index + 1}" for page, index in failed)
+        raise RepairError(f"could not repair {where}")
+
+    for (page, index), block in zip(targets, results):
+        data[page]["blocks"][index] = block
+        print(f"  🩹 Page {page + 1}, block {index + 1} repaired ({block['type']})")
+    try:
+        LESSON_ADAPTER.validate_python(data)
+    except ValidationError as e:
+        raise RepairError(f"lesson still invalid after splicing: {e.error_count()} error(s)") from e
+    print(f"✅ All {len(targets)} block(s) repaired with {REPAIR_BUDGET - budget['calls']} call(s)")
+    return data
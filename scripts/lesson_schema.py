@@ -0,0 +1,175 @@
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Optional, List, Literal, Union, Any, Dict, get_args
+try:
+    from typing import Annotated
+except ImportError:
+    from typing_extensions import Annotated
+
+class HookBlock(BaseModel):
+    type: Literal["hook"]
+    title: Optional[str] = None
+    opener: str
+    question: Optional[str] = None
+    context: Optional[str] = None
+
+class HeroFormulaBlock(BaseModel):
+    type: Literal["hero-formula"]
+    title: str
+    katexString: str
+    subtitle: Optional[str] = None
+    description: Optional[str] = None
+    streetNarrator: Optional[str] = None
+    variables: Optional[List[Dict[str, Any]]] = None
+
+class TextBlock(BaseModel):
+    type: Literal["text"]
+    title: Optional[str] = None
+    formalText: str
+    streetNarrator: str
+
+class DefinitionBlock(BaseModel):
+    type: Literal["definition"]
+    term: str
+    definition: str
+    variant: Optional[str] = None
+    title: Optional[str] = None
+
+class FormulaBlock(BaseModel):
+    type: Literal["formula", "formula-card"]
+    title: str
+    katexString: str
+    subtitle: Optional[str] = None
+    description: Optional[str] = None
+    streetNarrator: Optional[str] = None
+    variables: Optional[List[Dict[str, Any]]] = None
+
+class ReferenceTableRow(BaseModel):
+    ruleName: str
+    generalForm: str
+    numericExample: str
+    streetExplanation: str
+
+class ReferenceTableBlock(BaseModel):
+    type: Literal["reference-table"]
+    title: str
+    rows: List[ReferenceTableRow]
+
+class AnalogyBlock(BaseModel):
+    type: Literal["analogy"]
+    title: Optional[str] = None
+    content: str
+    icon: Optional[str] = None
+
+class DeepDiveSection(BaseModel):
+    title: str
+    content: str
+
+class DeepDiveBlock(BaseModel):
+    type: Literal["deep-dive"]
+    title: str
+    sections: List[DeepDiveSection]
+
+class AlertBlock(BaseModel):
+    type: Literal["alert", "callout"]
+    variant: Literal["tip", "warning", "prerequisite", "info"]
+    title: Optional[str] = None
+    content: str
+
+class WorkedExampleBlock(BaseModel):
+    type: Literal["worked-example", "real-world-example", "example"]
+    title: str
+    scenario: str
+    solution: str
+
+class CommonMistakeBlock(BaseModel):
+    type: Literal["common-mistake"]
+    mistake: str
+    correction: Optional[str] = None
+
+class GuidedExerciseStep(BaseModel):
+    title: Optional[str] = None
+    action: str
+    result: str
+
+class GuidedExerciseBlock(BaseModel):
+    type: Literal["guided-exercise"]
+    source: str
+    difficulty: Optional[int] = None
+    question: str
+    thinkingDirection: Optional[str] = None
+    steps: List[GuidedExerciseStep]
+    finalAnswer: str
+
+class ExamTipBlock(BaseModel):
+    type: Literal["exam-tip"]
+    source: Optional[str] = None
+    content: str
+
+class TopicSummaryBlock(BaseModel):
+    type: Literal["topic-summary"]
+    content: str
+
+class ImageBlock(BaseModel):
+    type: Literal["image"]
+    src: str
+    alt: str
+    caption: Optional[str] = None
+
+class StreetSmartBlock(BaseModel):
+    type: Literal["street-smart"]
+    title: Optional[str] = None
+    content: str
+    emoji: Optional[str] = None
+    opener: Optional[str] = None
+
+class QuizQuestion(BaseModel):
+    id: str
+    question: str
+    options: List[str]
+    correctIndex: int
+    explanation: Optional[str] = None
+
+class CheckpointQuizBlock(BaseModel):
+    type: Literal["checkpoint", "checkpoint-quiz"]
+    questions: List[QuizQuestion]
+
+# Need to set an alias generator to allow reading arbitrary types? 
+# We'll rely on correct json formats but fallback on ignoring exact discriminator match if it errors.
+# Actually, Pydantic handles discrimination.
+LessonBlock = Annotated[Union[
+    HookBlock,
+    HeroFormulaBlock,
+    TextBlock,
+    DefinitionBlock,
+    FormulaBlock,
+    ReferenceTableBlock,
+    AnalogyBlock,
+    DeepDiveBlock,
+    AlertBlock,
+    WorkedExampleBlock,
+    CommonMistakeBlock,
+    GuidedExerciseBlock,
+    ExamTipBlock,
+    TopicSummaryBlock,
+    ImageBlock,
+    StreetSmartBlock,
+    CheckpointQuizBlock,
+], Field(discriminator="type")]
+
+BLOCK_MODELS = get_args(get_args(LessonBlock)[0])
+
+def block_model_for(block_type):
+    # The block model whose "type" literal accepts block_type, or None
+    for model in BLOCK_MODELS:
+        if block_type in get_args(model.model_fields["type"].annotation):
+            return model
+    return None
+
+class LessonPage(BaseModel):
+    pageTitle: str
+    blocks: List[LessonBlock]
+
+# Built once at import; constructing a TypeAdapter compiles the whole union
+LESSON_ADAPTER = TypeAdapter(List[LessonPage])
+PAGE_ADAPTER = TypeAdapter(LessonPage)
+BLOCK_ADAPTER = TypeAdapter(LessonBlock)
@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+from disk_cache import CACHE_ROOT
+
+PROJECT_ROOT = Path(__file__).parent.parent
+MATERIALS_ROOT = PROJECT_ROOT / "input-materials"
+INDEX_PATH = CACHE_ROOT / "materials-index.json"
+INDEX_VERSION = 1
+# Subdirectories whose files feed a topic's OCR, in the order they are listed
+TOPIC_DIRS = ["lecture-slides", "ai-slides", "exercises", "exams"]
+SKIP_DIRS = {"extracted"}
+
+# A two-digit topic number between separators: lecture-05-x.pdf, 05-x.pdf, exercise-10b-x.docx, 05-10-x.pdf
+TOPIC_RE = re.compile(r"(?:^|(?<=[-_]))(\d{2})[a-z]?(?=[-_.])")
+CHAPTER_DIR_RE = re.compile(r"^(?:chapter|lecture|topic)-(\d{2})$")
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_topics(relative_path: str):
+    # Topics come from the filename; files without one inherit a chapter-NN folder's number
+    parts = relative_path.split("/")
+    topics = TOPIC_RE.findall(parts[-1])
+    if not topics:
+        for folder in reversed(parts[1:-1]):
+            match = CHAPTER_DIR_RE.match(folder)
+            if match:
+                topics = [match.group(1)]
+                break
+    return sorted(set(topics))
+
+class MaterialsIndex:
+    """
+    Cached course -> topic -> files index of input-materials.
+
+    refresh() walks every course with one recursive os.scandir pass, so
+    nested layouts (micro/lecture-slides/chapter-07/...) are covered, and
+    only re-hashes files whose size or mtime changed since the last run.
+    Each file entry keeps size, mtime_ns, sha256, its top-level folder and
+    topics. The index is saved to .cache/materials-index.json; topic lookups
+    are dictionary hits.
+    """
+
+    def __init__(self, path: Path = INDEX_PATH, root: Path = MATERIALS_ROOT):
+        self.path = Path(path)
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.courses = self._load()
+        self._topic_map = None
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == INDEX_VERSION and data.get("root") == str(self.root.resolve()):
+                return data["courses"]
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        payload = {"version": INDEX_VERSION, "root": str(self.root.resolve()), "courses": self.courses}
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def _walk(self, directory, relative=""):
+        for entry in os.scandir(directory):
+            name = f"{relative}{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS and not entry.name.startswith("."):
+                    yield from self._walk(entry.path, f"{name}/")
+            elif entry.is_file() and not entry.name.startswith("."):
+                yield name, entry
+
+    def refresh(self, courses=None):
+        """Bring the index up to date with the disk; returns the number of new or changed files."""
+        with self._lock:
+            changed = 0
+            course_names = courses or sorted(
+                entry.name for entry in os.scandir(self.root) if entry.is_dir() and not entry.name.startswith(".")
+            ) if self.root.exists() else []
+            for course in course_names:
+                course_dir = self.root / course
+                old_files = self.courses.get(course, {})
+                files = {}
+                for relative, entry in (self._walk(course_dir) if course_dir.is_dir() else []):
+                    stat = entry.stat()
+                    previous = old_files.get(relative)
+                    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+                        files[relative] = previous
+                        continue
+                    changed += 1
+                    files[relative] = {
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "sha256": hash_file(entry.path),
+                        "folder": relative.split("/")[0] if "/" in relative else "",
+                        "topics": file_topics(relative),
+                    }
+                if files.keys() != old_files.keys():
+                    changed += len(old_files.keys() - files.keys())
+                self.courses[course] = files
+            self._topic_map = None
+            if changed or not self.path.exists():
+                self.save()
+            return changed
+
+    def _topics_of(self, course):
+        # course -> topic -> [relative paths] for the PDFs in TOPIC_DIRS, built once per refresh
+        if self._topic_map is None:
+            self._topic_map = {}
+        if course not in self._topic_map:
+            topic_files = {}
+            order = {folder: i for i, folder in enumerate(TOPIC_DIRS)}
+            for relative, entry in sorted(self.courses.get(course, {}).items(), key=lambda item: (order.get(item[1]["folder"], 99), item[0])):
+                if entry["folder"] in order and relative.lower().endswith(".pdf"):
+                    for topic in entry["topics"]:
+                        topic_files.setdefault(topic, []).append(relative)
+            self._topic_map[course] = topic_files
+        return self._topic_map[course]
+
+    def files_for(self, course: str, topic: str):
+        return [self.root / course / relative for relative in self._topics_of(course).get(topic, [])]
+
+    def topics(self, course: str):
+        return sorted(self._topics_of(course))
+
+    def entry_for(self, path: Path):
+        relative = Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+        course, _, rest = relative.partition("/")
+        return self.courses.get(course, {}).get(rest)
+
+    def sha256(self, path: Path) -> str:
+        """A file's sha256, read again only when its size or mtime changed since it was indexed."""
+        parts = Path(path).resolve().relative_to(self.root.resolve()).parts
+        # Files the walk skips (extracted markdown, loose files at the top) are just hashed
+        if len(parts) < 3 or any(part in SKIP_DIRS or part.startswith(".") for part in parts):
+            return hash_file(path)
+        stat = Path(path).stat()
+        entry = self.entry_for(path)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            self.refresh([parts[0]])
+            entry = self.entry_for(path)
+        return entry["sha256"] if entry else hash_file(path)
+
+    def entries(self, courses=None):
+        for course, files in sorted(self.courses.items()):
+            if not courses or course in courses:
+                for relative, entry in sorted(files.items()):
+                    yield course, relative, entry
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def default_index():
+    # Refreshed once per process; a batch build then answers every lookup from memory
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = MaterialsIndex()
+            changed = _default_index.refresh()
+            if changed:
+                print(f"🗂️ Materials index updated ({changed} new or changed file(s))")
+        return _default_index
+
+def file_sha256(path) -> str:
+    # Files under input-materials come from the persisted index, so unchanged PDFs are never re-read
+    if Path(path).resolve().is_relative_to(MATERIALS_ROOT.resolve()):
+        return default_index().sha256(path)
+    return hash_file(path)
+
+if __name__ == "__main__":
+    index = MaterialsIndex()
+    changed = index.refresh()
+    print(f"🗂️ {changed} new or changed file(s) indexed in {index.path}")
+    for course in sorted(index.courses):
+        topics = index.topics(course)
+        print(f"   {course}: {len(index.courses[course])} files, {len(topics)} topic(s) {' '.join(topics)}")
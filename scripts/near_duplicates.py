@@ -0,0 +1,98 @@
+import re
+from collections import defaultdict
+
+# Share of a page's features that must reappear on another page for it to count as a copy or build step of it;
+# anything lower folds a slide that differs from its neighbour by one digit into that neighbour
+MIN_CONTAINMENT = 1.0
+WINDOW_TOKENS = 8
+# Vector-heavy pages (charts exported as hundreds of thousands of path operators) are only
+# matched as exact copies: every window would be too many to hold, and a sample can miss a changed digit
+MAX_WINDOWED_TOKENS = 50_000
+
+DO_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s+Do\b")
+
+def drawn_xobjects(page, data):
+    # Images and forms the content stream actually draws, keyed by their bytes so repeated
+    # copies of the same picture match even when they are separate objects
+    if "/Resources" not in page or "/XObject" not in page["/Resources"]:
+        return set()
+    xobjects = page["/Resources"]["/XObject"]
+    drawn = set()
+    for name in DO_RE.findall(data):
+        name = "/" + name.decode("latin-1")
+        if name in xobjects:
+            xobject = xobjects[name].get_object()
+            drawn.add(hash((len(xobject._data), xobject._data[:65536])))
+    return drawn
+
+def page_features(page):
+    """
+    (features, xobjects) of one page: overlapping windows of its content-stream
+    tokens, and the images and forms it draws.
+
+    Text is compared through its operators rather than pypdf's text layer:
+    extract_text() takes seconds on vector-heavy pages, and for fonts without
+    a usable text layer the glyph codes are all that tell pages apart.
+    """
+    contents = page.get_contents()
+    data = contents.get_data() if contents is not None else b""
+    tokens = data.split()
+    if len(tokens) > MAX_WINDOWED_TOKENS:
+        features = {hash(("stream", data))}
+    else:
+        features = {hash(tuple(tokens[i:i + WINDOW_TOKENS])) for i in range(max(1, len(tokens) - WINDOW_TOKENS + 1))}
+        features.discard(hash(()))
+    return features, drawn_xobjects(page, data)
+
+def near_duplicate_pages(reader, pages):
+    """
+    Find pages whose content is contained in another page of `pages`.
+
+    Returns {page: (representative, exact)}. A page is covered by another
+    when that page draws every image and form it draws and holds at least
+    MIN_CONTAINMENT of its content windows: a repeated
+    slide (exact, both ways) or an incremental build step (one way). Each
+    covered page maps to the largest page that covers it, and the first of
+    a set of identical pages is the one kept. Candidates come from an
+    inverted index over each page's rarest features. A page missing more
+    than the allowed share of its features is bound to miss one of them,
+    so no covering page is overlooked and the check stays linear in
+    practice. Hashes are per process, so results are only compared within
+    one run.
+    """
+    features = {}
+    for page_num in pages:
+        try:
+            features[page_num] = page_features(reader.pages[page_num - 1])
+        except Exception:
+            continue  # a page pypdf can't parse is simply OCR'd
+    postings = defaultdict(list)
+    for page_num, (page_set, _) in features.items():
+        for feature in page_set:
+            postings[feature].append(page_num)
+
+    covers = defaultdict(list)
+    for page_num, (page_set, xobjects) in features.items():
+        if not page_set:
+            continue  # blank pages have nothing to compare
+        allowed_misses = int(len(page_set) * (1 - MIN_CONTAINMENT))
+        rarest = sorted(page_set, key=lambda feature: len(postings[feature]))[:allowed_misses + 1]
+        for other in {p for feature in rarest for p in postings[feature]} - {page_num}:
+            other_set, other_xobjects = features[other]
+            if xobjects <= other_xobjects and len(page_set & other_set) >= len(page_set) - allowed_misses:
+                covers[page_num].append(other)
+
+    def rank(page_num):
+        return len(features[page_num][0]), -page_num
+
+    duplicates = {}
+    for page_num in covers:
+        representative = page_num
+        while True:
+            best = max(covers.get(representative, []) + [representative], key=rank)
+            if best == representative:
+                break
+            representative = best
+        if representative != page_num:
+            duplicates[page_num] = (representative, features[page_num] == features[representative])
+    return duplicates
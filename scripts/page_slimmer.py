@@ -0,0 +1,203 @@
+import io
+import re
+import zlib
+import base64
+import threading
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject, NumberObject, StreamObject
+from disk_cache import CACHE_ROOT, DiskCache, cache_key
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Gemini reads a page fine at 200 DPI; decks often embed photos at 300+ DPI
+SLIM_DPI = 200
+JPEG_QUALITY = 80
+# Re-encoding small icons and logos costs more than it saves
+MIN_IMAGE_BYTES = 32 * 1024
+# Flate-compressed images above this are photographic; diagrams compress far better
+PHOTO_BYTES_PER_PIXEL = 0.5
+SLIM_CACHE_DIR = CACHE_ROOT / "slim"
+SLIM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Bump when the slimming changes, so cached pages are redone
+SLIM_VERSION = 1
+# Pages slimmed at once; each holds its decoded images in memory, and the work is mostly CPU-bound anyway
+SLIM_CONCURRENCY = 2
+
+RESOURCE_KINDS = ("/Font", "/XObject", "/ExtGState", "/Pattern", "/Shading", "/ColorSpace", "/Properties")
+NAME_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+
+def used_resource_names(page):
+    # Every /Name token in the content stream; None when names are #-escaped and can't be trusted as-is
+    contents = page.get_contents()
+    if contents is None:
+        return set()
+    names = {match.decode("latin-1") for match in NAME_RE.findall(contents.get_data())}
+    return None if any("#" in name for name in names) else names
+
+def prune_resources(page):
+    """Drop fonts, images and other resources the page's content stream never names."""
+    if "/Resources" not in page:
+        return 0
+    used = used_resource_names(page)
+    if used is None:
+        return 0
+    resources = page["/Resources"].get_object()
+    # Old-style forms without their own /Resources draw from the page's
+    xobjects = resources["/XObject"].get_object() if "/XObject" in resources else {}
+    for name, xobject in xobjects.items():
+        xobject = xobject.get_object()
+        if name[1:] in used and xobject.get("/Subtype") == "/Form" and "/Resources" not in xobject:
+            used |= {match.decode("latin-1") for match in NAME_RE.findall(xobject.get_data())}
+    removed = 0
+    for kind in RESOURCE_KINDS:
+        if kind not in resources:
+            continue
+        entries = resources[kind].get_object()
+        for name in list(entries.keys()):
+            if name[1:] not in used:
+                del entries[name]
+                removed += 1
+    return removed
+
+def decode_image(xobject):
+    # 8-bit RGB/gray images only; pypdf has already undone Flate and its predictors, and passes JPEGs through
+    data = xobject.get_data()
+    if xobject.get("/Filter") == "/DCTDecode":
+        image = Image.open(io.BytesIO(data))
+        return image if image.mode in ("RGB", "L") else None
+    mode = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}.get(xobject.get("/ColorSpace"))
+    if xobject.get("/Filter") not in (None, "/FlateDecode") or mode is None or xobject.get("/BitsPerComponent") != 8:
+        return None
+    return Image.frombytes(mode, (xobject["/Width"], xobject["/Height"]), data)
+
+def image_stream(image, photo):
+    # Photos go out as JPEG; diagrams and screenshots stay lossless so thin lines and digits survive
+    stream = StreamObject()
+    if photo:
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY)
+        stream.set_data(buffer.getvalue())
+        stream[NameObject("/Filter")] = NameObject("/DCTDecode")
+    else:
+        stream.set_data(zlib.compress(image.tobytes(), 6))
+        stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+    stream.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(image.width),
+        NameObject("/Height"): NumberObject(image.height),
+        NameObject("/ColorSpace"): NameObject("/DeviceRGB" if image.mode == "RGB" else "/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    return stream
+
+def downsample_images(writer, page, dpi):
+    """
+    Downsample page-level images larger than `dpi` across the whole page.
+
+    The originals are left orphaned for compress_identical_objects() to
+    drop. Masked images (alpha would be lost) and images inside form
+    XObjects are left alone.
+    """
+    if Image is None or "/XObject" not in page.get("/Resources", {}):
+        return 0
+    max_width = float(page.mediabox.width) / 72 * dpi
+    max_height = float(page.mediabox.height) / 72 * dpi
+    xobjects = page["/Resources"]["/XObject"]
+    replaced = 0
+    for name in list(xobjects.keys()):
+        xobject = xobjects[name].get_object()
+        if xobject.get("/Subtype") != "/Image" or "/SMask" in xobject or "/Mask" in xobject:
+            continue
+        width, height = xobject["/Width"], xobject["/Height"]
+        scale = min(max_width / width, max_height / height)
+        encoded_bytes = len(xobject._data)
+        if scale >= 1.0 or encoded_bytes < MIN_IMAGE_BYTES:
+            continue
+        try:
+            image = decode_image(xobject)
+        except Exception:
+            continue  # a stream Pillow or pypdf can't decode; send it as it is
+        if image is None:
+            continue
+        photo = xobject.get("/Filter") == "/DCTDecode" or encoded_bytes / (width * height) > PHOTO_BYTES_PER_PIXEL
+        image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+        xobjects[name] = writer._add_object(image_stream(image, photo))
+        replaced += 1
+    return replaced
+
+def slim_page(page_data, dpi=SLIM_DPI):
+    """
+    Shrink a single-page PDF before upload; returns the smaller of the slimmed and original bytes.
+
+    Unused resources are dropped, content streams compressed, oversized
+    images downsampled to `dpi` (with Pillow installed) and identical or
+    orphaned objects removed. Embedded fonts that are used stay whole:
+    pypdf cannot subset them.
+    """
+    source_page = PdfReader(io.BytesIO(page_data)).pages[0]
+    # Pruned before cloning, so the writer never copies what only the dropped resources referenced
+    prune_resources(source_page)
+    writer = PdfWriter()
+    writer.add_page(source_page)
+    page = writer.pages[0]
+    downsample_images(writer, page, dpi)
+    page.compress_content_streams()
+    writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    slimmed = buffer.getvalue()
+    return slimmed if len(slimmed) < len(page_data) else page_data
+
+class PageSlimmer:
+    """
+    slim_page() with a disk cache and running byte totals.
+
+    Entries are keyed on the original page bytes, the DPI and SLIM_VERSION.
+    A page that fails to slim (a PDF feature pypdf can't rewrite) is sent
+    as-is. Safe to share between threads of one process; at most
+    SLIM_CONCURRENCY pages are slimmed at once to bound memory.
+    """
+
+    def __init__(self, cache=None, dpi=SLIM_DPI):
+        self.cache = cache
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(SLIM_CONCURRENCY)
+        self.pages = 0
+        self.original_bytes = 0
+        self.slimmed_bytes = 0
+
+    def slim(self, page_data):
+        key = cache_key(page_data, str(SLIM_VERSION), str(self.dpi))
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            # None marks a page that didn't get any smaller
+            slimmed = base64.b64decode(cached["pdf"]) if cached["pdf"] else page_data
+        else:
+            try:
+                with self._slots:
+                    slimmed = slim_page(page_data, self.dpi)
+            except Exception as e:
+                print(f"  ⚠️ Could not slim page, sending it as-is: {e}")
+                slimmed = page_data
+            if self.cache is not None:
+                encoded = base64.b64encode(slimmed).decode("ascii") if slimmed is not page_data else None
+                self.cache.set(key, {"pdf": encoded})
+        with self._lock:
+            self.pages += 1
+            self.original_bytes += len(page_data)
+            self.slimmed_bytes += len(slimmed)
+        return slimmed
+
+    def summary(self):
+        saved = self.original_bytes - self.slimmed_bytes
+        share = saved / self.original_bytes if self.original_bytes else 0
+        return (f"🪶 Slimmed {self.pages} page(s): {self.original_bytes / 1e6:.1f} MB → "
+                f"{self.slimmed_bytes / 1e6:.1f} MB ({share:.0%} smaller)")
+
+def open_slim_cache(no_cache=False):
+    return None if no_cache else DiskCache(SLIM_CACHE_DIR, SLIM_CACHE_MAX_BYTES)
@@ -0,0 +1,121 @@
+import time
+import queue
+import threading
+
+PENDING, RUNNING, DONE, FAILED, SKIPPED = "pending", "running", "done", "failed", "skipped"
+STATUS_ICONS = {PENDING: "·", RUNNING: "⏳", DONE: "✅", FAILED: "❌", SKIPPED: "⏭️"}
+
+class PipelineScheduler:
+    """
+    Runs every item through a fixed chain of stages, pipelined.
+
+    Each stage has its own bounded set of worker threads, and an item enters
+    stage n+1 as soon as its stage n finishes. Item B can therefore be in OCR
+    while item A is already generating, and both API-bound stages stay busy.
+    A stage that raises marks that item failed and skips its later stages;
+    other items carry on. On Ctrl-C, queued stages are dropped and running
+    ones are abandoned; the workers are daemon threads, so the process can
+    exit without waiting for them.
+    """
+
+    def __init__(self, stages, table_interval=5.0):
+        # stages: list of (name, fn(item), max_workers)
+        self.stages = stages
+        self.table_interval = table_interval
+        self._queues = [queue.Queue() for _ in stages]
+        self._cancelled = False
+        self._cond = threading.Condition()
+        self._status = {}
+        self._errors = {}
+        self._elapsed = {}
+        self._remaining = 0
+        self._last_table = 0.0
+
+    def run(self, items):
+        with self._cond:
+            for item in items:
+                self._status[item] = [PENDING] * len(self.stages)
+            self._remaining = len(self._status)
+        workers = [threading.Thread(target=self._work, args=(stage_index,), daemon=True)
+                   for stage_index, (_, _, count) in enumerate(self.stages) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        for item in self._status:
+            self._submit(item, 0)
+        try:
+            with self._cond:
+                while self._remaining:
+                    self._cond.wait(timeout=self.table_interval)
+                    self._maybe_print_table()
+        except KeyboardInterrupt:
+            self._cancelled = True
+            with self._cond:
+                unfinished = [f"{item} {self.stages[stage_index][0]}" for item, statuses in self._status.items()
+                              for stage_index, status in enumerate(statuses) if status == RUNNING]
+            print(f"\n🛑 Interrupted, left unfinished: {', '.join(unfinished) or 'nothing'}", flush=True)
+            raise
+        for stage_queue, (_, _, count) in zip(self._queues, self.stages):
+            for _ in range(count):
+                stage_queue.put(None)
+        for worker in workers:
+            worker.join()
+        self.print_table()
+        return self._status, self._errors
+
+    def _submit(self, item, stage_index):
+        self._queues[stage_index].put(item)
+
+    def _work(self, stage_index):
+        # None tells the worker the run is over; after a Ctrl-C queued items are dropped
+        while (item := self._queues[stage_index].get()) is not None:
+            if not self._cancelled:
+                self._run_stage(item, stage_index)
+
+    def _run_stage(self, item, stage_index):
+        name, fn, _ = self.stages[stage_index]
+        with self._cond:
+            self._status[item][stage_index] = RUNNING
+        started = time.monotonic()
+        try:
+            fn(item)
+            outcome = DONE
+        except (Exception, SystemExit) as e:
+            outcome = FAILED
+            error = f"{name}: {e}"
+        with self._cond:
+            if outcome == FAILED:
+                self._errors[item] = error
+            self._elapsed[(item, stage_index)] = time.monotonic() - started
+            self._status[item][stage_index] = outcome
+            next_stage = stage_index + 1
+            if outcome == FAILED:
+                for later in range(next_stage, len(self.stages)):
+                    self._status[item][later] = SKIPPED
+            if outcome == FAILED or next_stage == len(self.stages):
+                self._remaining -= 1
+                self._cond.notify_all()
+                return
+        self._submit(item, next_stage)
+        with self._cond:
+            self._maybe_print_table()
+
+    def _maybe_print_table(self):
+        now = time.monotonic()
+        if now - self._last_table < self.table_interval:
+            return
+        self._last_table = now
+        self.print_table()
+
+    def print_table(self):
+        width = max([len(str(item)) for item in self._status] + [4])
+        header = "item".ljust(width) + "".join(f" | {name:<14}" for name, _, _ in self.stages)
+        lines = ["", "📊 " + header, "   " + "-" * len(header)]
+        for item, statuses in self._status.items():
+            cells = []
+            for stage_index, status in enumerate(statuses):
+                cell = f"{STATUS_ICONS[status]} {status}"
+                if (item, stage_index) in self._elapsed:
+                    cell += f" {self._elapsed[(item, stage_index)]:.0f}s"
+                cells.append(f" | {cell:<14}")
+            lines.append("   " + str(item).ljust(width) + "".join(cells))
+        print("\n".join(lines) + "\n", flush=True)
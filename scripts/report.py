@@ -0,0 +1,88 @@
+import sys
+import argparse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+from telemetry import METRICS_PATH, MetricsSink
+
+def percentile(values, fraction):
+    # Nearest-rank percentile; fine for the few thousand calls of a build
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def summarize(records):
+    ok = [r for r in records if r["outcome"] == "ok"]
+    failed = [r for r in records if r["outcome"] != "ok"]
+    latencies = [r["latency_s"] for r in ok]
+    return {
+        "calls": len(ok),
+        "attempts": len(records),
+        "429s": sum(r["outcome"] == "rate_limited" for r in records),
+        "errors": sum(r["outcome"] == "error" for r in records),
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "wait_p95": percentile([r["wait_s"] for r in records], 0.95),
+        "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in ok),
+        "output_tokens": sum(r.get("output_tokens") or 0 for r in ok),
+        "mb_sent": sum(r.get("request_bytes") or 0 for r in records) / 1e6,
+        # Bytes --slim kept off the wire, per delivered page
+        "mb_saved": sum(r.get("bytes_saved") or 0 for r in ok) / 1e6,
+        # Time burned on attempts that had to be retried
+        "retry_s": sum(r["latency_s"] for r in failed),
+        "api_s": sum(r["latency_s"] for r in records),
+    }
+
+def seconds(value):
+    return "-" if value is None else f"{value:.1f}s"
+
+def print_table(title, groups):
+    print(f"\n📊 {title}")
+    header = (f"   {'':<12} {'calls':>6} {'tries':>6} {'429':>5} {'err':>5} {'p50':>7} {'p95':>7} {'wait95':>7}"
+              f" {'in tok':>10} {'out tok':>9} {'MB':>7} {'saved':>7} {'retry%':>7}")
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    for name, records in sorted(groups.items()):
+        s = summarize(records)
+        retry_share = s["retry_s"] / s["api_s"] if s["api_s"] else 0
+        print(f"   {name:<12} {s['calls']:>6} {s['attempts']:>6} {s['429s']:>5} {s['errors']:>5} {seconds(s['p50']):>7} {seconds(s['p95']):>7}"
+              f" {seconds(s['wait_p95']):>7} {s['prompt_tokens']:>10,} {s['output_tokens']:>9,} {s['mb_sent']:>7.1f} {s['mb_saved']:>7.1f} {retry_share:>7.0%}")
+
+def group_by(records, field):
+    groups = {}
+    for record in records:
+        groups.setdefault(str(record.get(field) or "-"), []).append(record)
+    return groups
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the Gemini API call metrics log")
+    parser.add_argument("--run", help="Only this run id, or 'last' for the most recent run")
+    parser.add_argument("--stage", help="Only this stage (ocr, lesson, repair)")
+    parser.add_argument("--course", help="Only this course")
+    parser.add_argument("--metrics", default=str(METRICS_PATH), help=f"Metrics file (default: {METRICS_PATH})")
+    args = parser.parse_args()
+
+    records = list(MetricsSink(Path(args.metrics)).read())
+    if args.run == "last" and records:
+        args.run = records[-1]["run"]
+    records = [
+        r for r in records
+        if (not args.run or r.get("run") == args.run)
+        and (not args.stage or r.get("stage") == args.stage)
+        and (not args.course or r.get("course") == args.course)
+    ]
+    if not records:
+        print(f"❌ ERROR: No matching API calls recorded in {args.metrics}")
+        sys.exit(1)
+
+    runs = {r.get("run") for r in records}
+    print(f"📈 {len(records)} attempts across {len(runs)} run(s)")
+    print_table("Per stage", group_by(records, "stage"))
+    print_table("Per course", group_by(records, "course"))
+    print_table("Per key", group_by(records, "key"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import re
+from lesson_schema import LESSON_ADAPTER
+
+# JSON Schema keywords Gemini's response_json_schema accepts
+SUPPORTED_KEYS = {
+    "$id", "$defs", "$ref", "$anchor", "type", "format", "title", "description", "enum",
+    "items", "prefixItems", "minItems", "maxItems", "minimum", "maximum",
+    "anyOf", "oneOf", "properties", "additionalProperties", "required", "propertyOrdering",
+}
+# The prose copy of the block shapes, redundant once the schema constrains decoding
+SHAPE_SECTION_RE = re.compile(r"^## Section 9 — Reference Output Shape\n.*?(?=^## |\Z)", re.MULTILINE | re.DOTALL)
+
+def _convert(node, path, narrowed):
+    if node == {} or node is True:
+        # Any: not expressible, so constrain to a string, which Any still accepts
+        narrowed.append(path)
+        return {"type": "string"}
+    converted = {}
+    for key, value in node.items():
+        if key == "const":
+            converted["enum"] = [value]
+        elif key in ("anyOf", "oneOf"):
+            # Optional[X] becomes X: the field is already left out of "required"
+            options = [_convert(option, path, narrowed) for option in value if option != {"type": "null"}]
+            if len(options) == 1:
+                converted.update(options[0])
+            else:
+                converted["anyOf"] = options
+        elif key in ("properties", "$defs"):
+            converted[key] = {name: _convert(child, f"{path}.{name}" if key == "properties" else name, narrowed)
+                              for name, child in value.items()}
+            if key == "properties":
+                # Keep model field order so "type" is always emitted first
+                converted["propertyOrdering"] = list(value)
+        elif key in ("items", "additionalProperties"):
+            converted[key] = _convert(value, f"{path}[]" if key == "items" else f"{path}.*", narrowed)
+        elif key in SUPPORTED_KEYS and key != "title":
+            converted[key] = value
+        # discriminator, default and titles are dropped: the tag lives in each block's "type" enum
+    return converted
+
+def lesson_response_schema():
+    """
+    Derive Gemini's response_json_schema from the List[LessonPage] model.
+
+    The discriminated union becomes an anyOf of the block schemas, each
+    pinning its "type" with an enum. Anything the dialect cannot express
+    is narrowed to something it can that the Pydantic model still accepts
+    (Any values become strings), so schema-valid output always validates.
+    Returns (schema, narrowed) where narrowed lists the affected field paths.
+    """
+    narrowed = []
+    schema = _convert(LESSON_ADAPTER.json_schema(), "", narrowed)
+    return schema, sorted(set(narrowed))
+
+def strip_shape_examples(system_instruction):
+    return SHAPE_SECTION_RE.sub("", system_instruction).rstrip().removesuffix("---").rstrip() + "\n"
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+METRICS_PATH = PROJECT_ROOT / "logs" / "api-calls.jsonl"
+METRICS_MAX_BYTES = 20 * 1024 * 1024
+METRICS_BACKUPS = 5
+USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "total_token_count")
+# Groups every call made by one build in the report; OCR shard processes inherit it
+RUN_ID = os.getenv("SIKUMNIK_RUN_ID") or f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+os.environ["SIKUMNIK_RUN_ID"] = RUN_ID
+
+def usage_dict(usage_metadata):
+    if usage_metadata is None:
+        return None
+    return {field: getattr(usage_metadata, field, None) for field in USAGE_FIELDS}
+
+class MetricsSink:
+    """
+    Append-only JSONL file rotated by size.
+
+    When the live file passes max_bytes it becomes <name>.1, the old .1
+    becomes .2 and so on, keeping at most `backups` old files. Safe to share
+    between threads of one process.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = METRICS_MAX_BYTES, backups: int = METRICS_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _backup(self, index):
+        return self.path.with_name(f"{self.path.name}.{index}")
+
+    def files(self):
+        # Oldest first, so records come out in time order
+        backups = [self._backup(i) for i in range(self.backups, 0, -1)]
+        return [path for path in backups + [self.path] if path.exists()]
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _rotate(self):
+        self._backup(self.backups).unlink(missing_ok=True)
+        for i in range(self.backups - 1, 0, -1):
+            if self._backup(i).exists():
+                os.replace(self._backup(i), self._backup(i + 1))
+        os.replace(self.path, self._backup(1))
+
+    def read(self):
+        for path in self.files():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+_default_sink = None
+_default_sink_lock = threading.Lock()
+
+def default_sink():
+    # SIKUMNIK_METRICS=0 turns recording off
+    global _default_sink
+    if os.getenv("SIKUMNIK_METRICS", "1") == "0":
+        return None
+    with _default_sink_lock:
+        if _default_sink is None:
+            _default_sink = MetricsSink(METRICS_PATH)
+        return _default_sink
+
+def record_call(tags, key_id, attempt, wait, latency, outcome, response=None, error=None):
+    """Record one model call attempt; tags carry stage/course/topic/page/request_bytes."""
+    sink = default_sink()
+    if sink is None:
+        return
+    usage = usage_dict(getattr(response, "usage_metadata", None)) or {}
+    record = {
+        "ts": round(time.time(), 3),
+        "run": RUN_ID,
+        **(tags or {}),
+        "key": key_id,
+        "attempt": attempt,
+        "wait_s": round(wait, 3),
+        "latency_s": round(latency, 3),
+        "outcome": outcome,
+        "prompt_tokens": usage.get("prompt_token_count"),
+        "output_tokens": usage.get("candidates_token_count"),
+        "total_tokens": usage.get("total_token_count"),
+    }
+    if error is not None:
+        record["error"] = str(error)[:300]
+    try:
+        sink.write(record)
+    except OSError as e:
+        print(f"  ⚠️ Could not write API metrics: {e}")
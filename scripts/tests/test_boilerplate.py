@@ -0,0 +1,20 @@
+from boilerplate import strip_boilerplate
+
+def topic_markdown(pages):
+    return "# Extracted Content: micro Topic 01\n\nSource: deck.pdf\nCourse: micro | Topic: 01\n\n" + "".join(
+        f"\n\n--- PAGE {p} ---\n\n{body}" for p, body in enumerate(pages, start=1)
+    )
+
+def test_strips_footers_but_keeps_headings_and_long_lines():
+    sentence = "הביקוש לטובין נורמליים עולה כאשר ההכנסה של הצרכן עולה, בהנחה שכל שאר הגורמים נשארים קבועים לאורך זמן"
+    pages = [f"# עמוד {p}\n\nנקודה {p * 7919} על העקומה\n\n{sentence}\n\nמבוא למיקרו כלכלה 10131\n\nעמוד {p} מתוך 30"
+             for p in range(1, 31)]
+    text, stats = strip_boilerplate(topic_markdown(pages))
+
+    assert "מבוא למיקרו כלכלה 10131" not in text
+    assert "מתוך 30" not in text
+    assert text.count(sentence) == 30
+    for p in range(1, 31):
+        assert f"# עמוד {p}\n" in text
+        assert f"--- PAGE {p} ---" in text
+    assert stats["collapsed"] == 0
@@ -0,0 +1,15 @@
+from disk_cache import DiskCache
+
+def disk_size(cache):
+    return sum(size for _, size, _ in cache._entries())
+
+def test_tracked_size_matches_disk_across_restarts(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10_000)
+    cache.set("aa01", {"text": "x" * 100})
+    cache.set("aa02", {"text": "y" * 200})
+
+    # A fresh instance starts with an unknown size; its first set scans the directory
+    cache = DiskCache(tmp_path, max_bytes=10_000)
+    cache.set("aa01", {"text": "z" * 50})
+    cache.set("bb03", {"text": "w" * 300})
+    assert cache._size == disk_size(cache)
@@ -0,0 +1,49 @@
+from pypdf import PdfWriter
+import gemini_precision_ocr
+
+def make_pdf(path, pages, width=200):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=width, height=200)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+def fake_ocr(label):
+    def extract_page_with_retry(pool, page_data, page_num, cache=None, refresh=False, tags=None, slimmer=None):
+        return f"{label} {tags['source']} page {page_num}"
+    return extract_page_with_retry
+
+def test_pages_rerun_leaves_sibling_sources(tmp_path, monkeypatch):
+    output_file = tmp_path / "topic-05-extracted.md"
+    monkeypatch.setattr(gemini_precision_ocr, "topic_output_file", lambda course, topic: output_file)
+    a = make_pdf(tmp_path / "lecture-05-a.pdf", 3)
+    b = make_pdf(tmp_path / "lecture-05-b.pdf", 3, width=300)
+
+    monkeypatch.setattr(gemini_precision_ocr, "extract_page_with_retry", fake_ocr("first"))
+    gemini_precision_ocr.extract_pdfs([a, b], "math", "05", None, retire_missing=True)
+    monkeypatch.setattr(gemini_precision_ocr, "extract_page_with_retry", fake_ocr("second"))
+    summary = gemini_precision_ocr.extract_pdfs([b], "math", "05", None, pages="2")[0]
+
+    markdown = output_file.read_text(encoding="utf-8")
+    assert summary["success_count"] == 1
+    assert "Additional Source: lecture-05-b.pdf" in markdown
+    for page in (1, 2, 3):
+        assert f"first lecture-05-a.pdf page {page}" in markdown
+    assert "first lecture-05-b.pdf page 1" in markdown
+    assert "second lecture-05-b.pdf page 2" in markdown
+    assert "first lecture-05-b.pdf page 2" not in markdown
+
+def test_full_file_set_retires_missing_sources(tmp_path, monkeypatch):
+    output_file = tmp_path / "topic-05-extracted.md"
+    monkeypatch.setattr(gemini_precision_ocr, "topic_output_file", lambda course, topic: output_file)
+    monkeypatch.setattr(gemini_precision_ocr, "extract_page_with_retry", fake_ocr("first"))
+    a = make_pdf(tmp_path / "lecture-05-a.pdf", 2)
+    b = make_pdf(tmp_path / "lecture-05-b.pdf", 2, width=300)
+
+    gemini_precision_ocr.extract_pdfs([a, b], "math", "05", None, retire_missing=True)
+    gemini_precision_ocr.extract_pdfs([b], "math", "05", None, resume=True, retire_missing=True)
+
+    markdown = output_file.read_text(encoding="utf-8")
+    assert "lecture-05-a.pdf" not in markdown
+    assert markdown.count("--- PAGE 1 ---") == 1
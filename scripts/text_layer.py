@@ -0,0 +1,80 @@
+import re
+
+# Born-digital slides usually carry a text layer good enough to skip OCR, but
+# pypdf mangles anything typeset with an equation editor and often scrambles
+# digits in Hebrew runs. Only plain Hebrew prose is trusted; everything else
+# still goes to Gemini.
+MIN_TEXT_CHARS = 200
+MIN_HEBREW_RATIO = 0.6
+MAX_DIGIT_RATIO = 0.05
+
+HEBREW_RE = re.compile(r"[֐-׿]")
+LATIN_RE = re.compile(r"[A-Za-z]")
+DIGIT_RE = re.compile(r"\d")
+MATH_RE = re.compile(
+    r"[\U0001D400-\U0001D7FF]"      # mathematical alphanumerics (𝑥, 𝑓, ...)
+    r"|[∑∫√≤≥≠±→∞∈∉∪∩⊂⊆≈×÷∂∆Δπ∀∃ⅇ]"
+    r"|\blim\b|[=^]"
+)
+# Cues that the extraction itself went wrong: missing glyph maps, private-use
+# fonts, raw glyph names ("/square6") and Latin letters wedged between Hebrew
+# ones, which is how broken ToUnicode maps show up
+GARBAGE_RE = re.compile(r"[\ufffd\ue000-\uf8ff]|/[A-Za-z]+\d*|[֐-׿][A-Za-z][֐-׿]")
+# Shadowed/outlined text is drawn twice and extracts as "word word" or "a b a b"
+MAX_REPEATED_WORD_RATIO = 0.05
+# Text laid out glyph by glyph loses its spaces and comes out as one long run
+MAX_AVG_WORD_LENGTH = 9
+# pypdf emits RTL lines with their trailing punctuation at the front (":דוגמאות")
+LEADING_PUNCT_RE = re.compile(r"^([.:,;?!]+)\s*(?=[֐-׿])")
+
+def repeated_word_ratio(words, max_run=8):
+    # Share of positions that start an immediately repeated run of 1..max_run words
+    repeated = 0
+    for i in range(len(words)):
+        for n in range(1, max_run + 1):
+            if words[i:i + n] == words[i + n:i + 2 * n] and i + 2 * n <= len(words):
+                repeated += 1
+                break
+    return repeated / max(1, len(words))
+
+def score_text_layer(text):
+    """Return (usable, reason) for a page's extracted text layer."""
+    compact = re.sub(r"\s+", "", text or "")
+    if len(compact) < MIN_TEXT_CHARS:
+        return False, "too short"
+    if GARBAGE_RE.search(text):
+        return False, "unmapped glyphs"
+    words = text.split()
+    if len(compact) / max(1, len(words)) > MAX_AVG_WORD_LENGTH:
+        return False, "missing spaces"
+    if repeated_word_ratio(words) > MAX_REPEATED_WORD_RATIO:
+        return False, "doubled text"
+    if MATH_RE.search(text):
+        return False, "math"
+    hebrew = len(HEBREW_RE.findall(compact))
+    latin = len(LATIN_RE.findall(compact))
+    if hebrew / max(1, hebrew + latin) < MIN_HEBREW_RATIO:
+        return False, "low hebrew ratio"
+    if len(DIGIT_RE.findall(compact)) / len(compact) > MAX_DIGIT_RATIO:
+        return False, "digit-heavy"
+    return True, "ok"
+
+def normalize_text_layer(text):
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        match = LEADING_PUNCT_RE.match(line)
+        if match:
+            line = line[match.end():] + match.group(1)
+        lines.append(line)
+    # Collapse the runs of blank lines slide exports are full of
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def text_layer_content(page):
+    """Local extraction for a pypdf page, or None if it should go to OCR."""
+    try:
+        text = page.extract_text() or ""
+    except Exception:
+        return None
+    usable, _ = score_text_layer(text)
+    return normalize_text_layer(text) if usable else None
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from pydantic import ValidationError
+from lesson_schema import LESSON_ADAPTER
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CHAPTERS_DIR = PROJECT_ROOT / "web" / "src" / "data" / "chapters"
+# Below this many files a process pool costs more to start than it saves
+MIN_FILES_FOR_POOL = 8
+
+def find_chapter_files(courses=None):
+    files = []
+    for course_dir in sorted(CHAPTERS_DIR.iterdir()) if CHAPTERS_DIR.exists() else []:
+        if course_dir.is_dir() and (not courses or course_dir.name in courses):
+            files.extend(sorted(course_dir.glob("chapter-*.json")))
+    return files
+
+def format_loc(loc):
+    path = ""
+    for part in loc:
+        path += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return path.lstrip(".")
+
+def count_blocks(raw):
+    try:
+        return sum(len(page.get("blocks", [])) for page in json.loads(raw) if isinstance(page, dict))
+    except (ValueError, TypeError, AttributeError):
+        return 0
+
+def validate_file(path):
+    raw = Path(path).read_bytes()
+    try:
+        pages = LESSON_ADAPTER.validate_json(raw, strict=True)
+    except ValidationError as e:
+        errors = [(format_loc(error["loc"]), error["msg"]) for error in e.errors()]
+        return str(path), count_blocks(raw), errors
+    return str(path), sum(len(page.blocks) for page in pages), []
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate every generated chapter JSON against the lesson schema")
+    parser.add_argument("--course", action="append", choices=['math', 'micro', 'acct', 'orgbh'], help="Only check this course (repeatable)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--quiet", action="store_true", help="Only print failing files and the summary")
+    args = parser.parse_args()
+
+    files = find_chapter_files(args.course)
+    if not files:
+        print(f"❌ ERROR: No chapter-*.json files found under {CHAPTERS_DIR}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    if args.jobs > 1 and len(files) >= MIN_FILES_FOR_POOL:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(validate_file, files, chunksize=max(1, len(files) // (args.jobs * 4))))
+    else:
+        results = [validate_file(path) for path in files]
+    elapsed = time.perf_counter() - started
+
+    total_blocks = 0
+    failed_files = 0
+    for path, blocks, errors in results:
+        total_blocks += blocks
+        name = Path(path).relative_to(CHAPTERS_DIR)
+        if errors:
+            failed_files += 1
+            print(f"❌ {name}: {len(errors)} error(s)")
+            for loc, msg in errors:
+                print(f"    {loc}: {msg}")
+        elif not args.quiet:
+            print(f"✅ {name}: {blocks} blocks")
+
+    rate = 1 / elapsed if elapsed else float("inf")
+    print(f"\n📊 {len(files)} files, {total_blocks} blocks in {elapsed * 1000:.1f} ms "
+          f"({len(files) * rate:.0f} files/s, {total_blocks * rate:.0f} blocks/s)")
+    if failed_files:
+        print(f"❌ {failed_files}/{len(files)} files failed validation")
+        sys.exit(1)
+    print("🎉 All chapters valid")
+
+if __name__ == "__main__":
+    main()